@@ -0,0 +1,112 @@
+# analysis_store.py - Shared store of website analyses, keyed by normalised URL
+"""
+``/api/analyse-website`` fetches a site, extracts its text and spends a
+Claude call on a business summary. The result is kept here, in SQLite under
+``storage.STATE_DIR`` so every worker sees it, for ``ANALYSIS_TTL`` seconds:
+
+* a repeat analysis of the same site is answered from the store
+* ``build_audit_prompt`` adds the summary and page text to the audit, so
+  the report is grounded in the site without fetching it again
+
+Keys ignore scheme, a leading ``www.``, default ports, trailing slashes,
+fragments and query-parameter order, so ``https://www.acme.co.uk/`` and
+``acme.co.uk`` share one entry.
+"""
+
+import json
+import os
+import time
+import urllib.parse
+
+import metrics
+import storage
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+TTL = int(os.getenv("ANALYSIS_TTL", str(24 * 3600)))
+
+_DB = "analyses.db"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    key        TEXT PRIMARY KEY,
+    url        TEXT NOT NULL,
+    text       TEXT NOT NULL,
+    summary    TEXT,
+    meta       TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_created ON analyses (created_at);
+"""
+
+
+def _db():
+    return storage.connect(_DB, _SCHEMA)
+
+
+def normalise_url(website: str) -> str:
+    """Canonical key for a website as a user would type it."""
+    raw = website.strip()
+    parts = urllib.parse.urlsplit(raw if "//" in raw else f"//{raw}")
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    host = (parts.hostname or "").lower().removeprefix("www.")
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parts.query, keep_blank_values=True)))
+    return host + parts.path.rstrip("/") + (f"?{query}" if query else "")
+
+
+def get(website: str) -> dict | None:
+    """The stored analysis for ``website``, or None if absent or expired."""
+    row = _db().execute(
+        "SELECT url, text, summary, meta, created_at FROM analyses WHERE key = ? AND created_at >= ?",
+        (normalise_url(website), time.time() - TTL),
+    ).fetchone()
+    if row is None:
+        metrics.incr("analysis_store_misses")
+        return None
+    metrics.incr("analysis_store_hits")
+    return {
+        "url": row["url"],
+        "text": row["text"],
+        "summary": row["summary"],
+        "meta": json.loads(row["meta"]),
+        "created_at": row["created_at"],
+    }
+
+
+def put(website: str, page: dict, summary: str | None) -> None:
+    """Store ``page`` (a ``page_fetch.fetch_page_text`` result) and its summary.
+
+    ``page["text"]`` should be the ``prompt_budget.assemble`` text the summary
+    was written from; the raw blocks are not kept.
+    """
+    now = time.time()
+    meta = {key: value for key, value in page.items() if key not in ("text", "blocks")}
+    meta["fetched_at"] = now
+    conn = _db()
+    conn.execute(
+        "INSERT OR REPLACE INTO analyses (key, url, text, summary, meta, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (normalise_url(website), str(page["url"]), page["text"], summary, json.dumps(meta), now),
+    )
+    conn.execute("DELETE FROM analyses WHERE created_at < ?", (now - TTL,))
+    metrics.incr("analysis_store_writes")
+
+
+def stats() -> dict:
+    """Shared entry count plus this worker's hit rate."""
+    entries = _db().execute(
+        "SELECT COUNT(*) FROM analyses WHERE created_at >= ?", (time.time() - TTL,)
+    ).fetchone()[0]
+    counters = metrics.snapshot()
+    hits = counters.get("analysis_store_hits", 0)
+    lookups = hits + counters.get("analysis_store_misses", 0)
+    return {
+        "entries": entries,
+        "ttl_seconds": TTL,
+        "hits": hits,
+        "lookups": lookups,
+        "hit_rate": round(hits / lookups, 3) if lookups else None,
+    }
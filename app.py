@@ -2,18 +2,36 @@
 """Flask backend for Joro uploads – fixed quoting & token issues."""
 
 import os
+import json
+import time
 import uuid
-import tempfile
 import pathlib
 import datetime
 import textwrap
+import urllib.parse
 
 import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 
+import analysis_store
+import audit_jobs
+import audit_sections
+import doc_extract
+import http_client
+import llm_cache
+import metrics
+import page_fetch
+import portfolio
+import prompt_budget
+import prompts
+import report
+import resilience
+import speculation
+import static_assets
+import uploads
+
 # ────────── configuration ────────────────────────────────────────────────────
 
 load_dotenv()
@@ -24,18 +42,36 @@ if not CLAUDE_KEY:
 CLAUDE_MODEL = os.getenv("CLAUDE_MODEL", "claude-3-haiku-20240307")
 MAX_TOKENS = int(os.getenv("CLAUDE_MAX_TOKENS", "12000"))
 
+# "html": Claude writes the whole report. "structured": Claude returns JSON
+# and the server renders it with report.REPORT_TEMPLATE. "sections": each
+# section is a separate concurrent request, stitched by audit_sections.
+AUDIT_MODES = ("html", "structured", "sections")
+AUDIT_MODE = os.getenv("AUDIT_MODE", "html")
+AUDIT_JSON_MAX_TOKENS = int(os.getenv("AUDIT_JSON_MAX_TOKENS", "3000"))
+
 BASE_DIR = pathlib.Path(__file__).resolve().parent
-TMP_DIR = pathlib.Path(tempfile.gettempdir()) / "joro_uploads"
-TMP_DIR.mkdir(exist_ok=True)
 
 # ────────── Claude API helper ───────────────────────────────────────────────
 
-def call_claude(prompt: str, *, temperature: float = 0.3, max_tokens: int | None = None) -> str:
-    """Simple wrapper that POSTs to Anthropic's messages endpoint."""
+# Override to point at a local stand-in, e.g. bench/fake_claude.py.
+CLAUDE_URL = os.getenv("CLAUDE_API_URL", "https://api.anthropic.com/v1/messages")
+
+
+def _claude_request(
+    prompt: str | list[dict],
+    temperature: float,
+    max_tokens: int | None,
+    system: str | list[dict] | None = None,
+    **extra,
+) -> tuple[dict, dict]:
+    """Build the headers and JSON body for a Messages API call.
+
+    ``prompt`` is the user turn: a string or a list of content blocks.
+    ``system`` may likewise be a string or blocks carrying ``cache_control``.
+    """
     if max_tokens is None:
         max_tokens = MAX_TOKENS
 
-    url = "https://api.anthropic.com/v1/messages"
     headers = {
         "x-api-key": CLAUDE_KEY,
         "anthropic-version": "2023-06-01",
@@ -46,24 +82,186 @@ def call_claude(prompt: str, *, temperature: float = 0.3, max_tokens: int | None
         "max_tokens": max_tokens,
         "temperature": temperature,
         "messages": [{"role": "user", "content": prompt}],
+        **extra,
     }
+    if system:
+        data["system"] = system
+    return headers, data
+
+
+def _cache_key(data: dict) -> str:
+    prompt = [data.get("system"), data["messages"]] if data.get("system") else data["messages"]
+    return llm_cache.make_key(data["model"], prompt, data["temperature"], data["max_tokens"])
 
-    print(f"[Claude] → prompt length: {len(prompt)} chars | max_tokens={max_tokens}")
-    resp = requests.post(url, headers=headers, json=data, timeout=60)
-    print(f"[Claude] ← status {resp.status_code}")
 
-    if resp.status_code != 200:
-        raise RuntimeError(f"Claude API error {resp.status_code}: {resp.text}")
+def _prompt_size(data: dict) -> tuple[int, int]:
+    """(characters, estimated tokens) of a request's system and message text."""
+    def texts(content):
+        if isinstance(content, str):
+            return [content]
+        return [block.get("text", "") for block in content or []]
+
+    parts = texts(data.get("system")) + [text for m in data["messages"] for text in texts(m["content"])]
+    return sum(map(len, parts)), sum(map(prompt_budget.estimate_tokens, parts))
+
+
+def _log_usage(usage: dict, estimated: int | None = None) -> None:
+    """Log token usage, including prompt-cache reads and writes.
+
+    ``estimated`` is ``prompt_budget``'s input estimate; it is logged against
+    the actual prompt size (input plus cache reads and writes).
+    """
+    counts = {
+        "input": usage.get("input_tokens", 0),
+        "output": usage.get("output_tokens", 0),
+        "cache_write": usage.get("cache_creation_input_tokens") or 0,
+        "cache_read": usage.get("cache_read_input_tokens") or 0,
+    }
+    metrics.record_usage(counts)
+    estimate = ""
+    actual = counts["input"] + counts["cache_write"] + counts["cache_read"]
+    if estimated and actual:
+        metrics.incr("prompt_tokens_estimated", estimated)
+        metrics.incr("prompt_tokens_actual", actual)
+        estimate = f" | estimated in={estimated} ({estimated / actual:.2f}x)"
+    print(
+        f"[Claude] ← usage in={counts['input']} out={counts['output']} "
+        f"cache_write={counts['cache_write']} cache_read={counts['cache_read']}{estimate}"
+    )
+
 
-    payload = resp.json()
+def _response_text(payload: dict, estimated: int | None = None) -> str:
+    _log_usage(payload.get("usage", {}), estimated)
     if "content" in payload and payload["content"]:
         return payload["content"][0]["text"]
     raise RuntimeError("Unexpected Claude response format.")
 
 
+def _stream_delta(line: str, usage: dict) -> str | None:
+    """Fold one SSE line of a Messages stream into ``usage``; return its text delta."""
+    if not line.startswith("data:"):
+        return None
+    event = json.loads(line[5:])
+    kind = event.get("type")
+
+    if kind == "content_block_delta" and event["delta"].get("type") == "text_delta":
+        return event["delta"]["text"]
+    if kind == "message_start":
+        usage.update(event["message"].get("usage", {}))
+    elif kind == "message_delta":
+        usage.update(event.get("usage", {}))
+        usage["stop_reason"] = event.get("delta", {}).get("stop_reason", usage.get("stop_reason"))
+    elif kind == "error":
+        raise RuntimeError(f"Claude stream error: {event.get('error')}")
+    return None
+
+
+def call_claude(
+    prompt: str | list[dict],
+    *,
+    system: str | list[dict] | None = None,
+    temperature: float = 0.3,
+    max_tokens: int | None = None,
+    use_cache: bool = True,
+    hedge: bool = False,
+    cache_if=None,
+) -> str:
+    """Simple wrapper that POSTs to Anthropic's messages endpoint.
+
+    Responses are served from / written to ``llm_cache``; ``use_cache=False``
+    skips the lookup but still refreshes the stored entry. Requests go through
+    ``resilience`` (throttling, retries, circuit breaker); ``hedge=True`` also
+    races a duplicate when the call outlives the observed p95 — only worth it
+    for short prompts. ``cache_if(text)``, when given, must be true for the
+    reply to be stored.
+    """
+    headers, data = _claude_request(prompt, temperature, max_tokens, system)
+
+    key = _cache_key(data)
+    if use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            print(f"[Claude] cache hit {key[:12]} | {len(cached)} chars")
+            return cached
+
+    chars, tokens = _prompt_size(data)
+    print(f"[Claude] → prompt length: {chars} chars (~{tokens} tokens) | max_tokens={data['max_tokens']}")
+
+    def post() -> dict:
+        resp = resilience.send(
+            lambda: http_client.post(CLAUDE_URL, headers=headers, json=data),
+            estimated_tokens=tokens,
+        )
+        print(f"[Claude] ← status {resp.status_code}")
+        if resp.status_code != 200:
+            raise RuntimeError(f"Claude API error {resp.status_code}: {resp.text}")
+        return resp.json()
+
+    with metrics.claude_call():
+        payload = resilience.hedged(f"claude-{data['max_tokens']}", post) if hedge else post()
+    text = _response_text(payload, tokens)
+    if cache_if is None or cache_if(text):
+        llm_cache.put(key, text)
+    return text
+
+
+def stream_claude(
+    prompt: str | list[dict],
+    *,
+    system: str | list[dict] | None = None,
+    temperature: float = 0.3,
+    max_tokens: int | None = None,
+    use_cache: bool = True,
+    cache_if=None,
+):
+    """Stream a completion, yielding ("text", str) deltas then one ("usage", dict).
+
+    Shares cache entries with ``call_claude``: a hit is replayed as a single
+    text chunk, and a completed stream is stored for later calls.
+    """
+    headers, data = _claude_request(prompt, temperature, max_tokens, system, stream=True)
+
+    key = _cache_key(data)
+    if use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            print(f"[Claude] cache hit {key[:12]} | {len(cached)} chars")
+            yield "text", cached
+            yield "usage", {"cache_hit": True}
+            return
+
+    chars, tokens = _prompt_size(data)
+    print(f"[Claude] → streaming prompt length: {chars} chars (~{tokens} tokens) | max_tokens={data['max_tokens']}")
+    resp = resilience.send(
+        lambda: http_client.post(CLAUDE_URL, headers=headers, json=data, stream=True),
+        estimated_tokens=tokens,
+    )
+    with metrics.claude_call(), resp:
+        print(f"[Claude] ← stream status {resp.status_code}")
+        if resp.status_code != 200:
+            raise RuntimeError(f"Claude API error {resp.status_code}: {resp.text}")
+
+        usage = {"stop_reason": None}
+        parts = []
+        for line in resp.iter_lines(decode_unicode=True):
+            text = _stream_delta(line or "", usage)
+            if text:
+                parts.append(text)
+                yield "text", text
+
+    _log_usage(usage, tokens)
+    text = "".join(parts)
+    if cache_if is None or cache_if(text):
+        llm_cache.put(key, text)
+    yield "usage", usage
+
+
 # ────────── Flask setup ─────────────────────────────────────────────────────
 
 app = Flask(__name__, static_folder=str(BASE_DIR / "static"))
+# Reject oversized bodies from Content-Length before anything is read;
+# the slack covers multipart framing around the file itself.
+app.config["MAX_CONTENT_LENGTH"] = uploads.MAX_BYTES + 64 * 1024
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
 
@@ -75,59 +273,128 @@ def _add_cors_headers(resp):
     return resp
 
 
+@app.before_request
+def _start_job_runners():
+    # Not at import time: portfolio.py imports this module, and a CLI run must
+    # not pull jobs off the shared queue into threads that die when it exits.
+    audit_jobs.start(_run_audit)
+
+
+@app.before_request
+def _start_request_timer():
+    if request.path.startswith("/api/"):
+        metrics.start_request(request.endpoint or "unknown")
+
+
+@app.after_request
+def _finish_request_timer(resp):
+    if resp.is_streamed:
+        resp.response = metrics.stream_request(resp.response, resp.status_code)
+    else:
+        metrics.finish_request(resp.status_code)
+    return resp
+
+
+@app.errorhandler(413)
+def _too_large(_exc):
+    return jsonify(error=f"file exceeds {uploads.MAX_BYTES / (1024 * 1024):g} MB limit"), 413
+
+
 # ────────── helper utilities ────────────────────────────────────────────────
 
+def _cache_bypass(data: dict | None) -> bool:
+    """True when the client asked for a fresh completion."""
+    if "no-cache" in request.headers.get("Cache-Control", ""):
+        return True
+    return bool((data or {}).get("no_cache"))
+
+
 def short_id() -> str:
     return uuid.uuid4().hex[:12]
 
 
 def _get_uploaded_files(file_ids: list[str]):
-    files = []
-    for fid in file_ids:
-        for path in TMP_DIR.glob(f"{fid}_*"):
-            filename = path.name[len(fid) + 1 :]
-            files.append({"id": fid, "filename": filename, "path": str(path)})
-    return files
+    return uploads.lookup(file_ids)
 
 
 # ────────── API endpoints ───────────────────────────────────────────────────
 
 # Static front‑end
+
+def _static_response(path: str) -> Response:
+    """Serve a prebuilt asset: compressed variant, ETag and 304 revalidation."""
+    asset = static_assets.get(app.static_folder, path)
+    if asset is None:
+        return send_from_directory(app.static_folder, path)
+
+    encoding = asset.negotiate(request.headers.get("Accept-Encoding", ""))
+    headers = {"ETag": f'"{asset.etag(encoding)}"', "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+    if request.if_none_match.star_tag or asset.matches(request.if_none_match.as_set(include_weak=True)):
+        return Response(status=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(asset.bodies[encoding], mimetype=asset.mimetype, headers=headers)
+
+
 @app.route("/")
 def index():
-    return send_from_directory(app.static_folder, "index.html")
+    return _static_response("index.html")
 
 
 @app.route("/<path:path>")
 def serve_static(path):
-    return send_from_directory(app.static_folder, path)
+    return _static_response(path)
 
 
 # ---- quick site analysis ---------------------------------------------------
+
+def analysis_prompt(website: str, text: str) -> str:
+    return textwrap.dedent(
+        f"""\nAnalyze the business activities found on **{website}**.\nProvide a concise summary (≤100 words) that includes:\n1. Industry / sector\n2. Main business activities\n3. Products or services offered\n4. Notable insurance‑relevant risks\n\nExtracted text (truncated):\n{text}\n"""
+    )
+
+
+def analyse_site(website: str, *, use_cache: bool = True) -> dict:
+    """Fetch, summarise and store ``website``; the analyse-website response fields.
+
+    Raises ``requests.RequestException`` / ``page_fetch.FetchError`` if the
+    page cannot be fetched and ``RuntimeError`` if Claude fails.
+    """
+    if use_cache:
+        with metrics.span("analysis_lookup"):
+            stored = analysis_store.get(website)
+        if stored and stored["summary"]:
+            return {"summary": stored["summary"], "cached": True}
+
+    # Fetch and text extraction are interleaved (streamed parse), so one span.
+    with metrics.span("fetch"):
+        page = page_fetch.fetch_page_text(website, max_chars=page_fetch.SCAN_CHARS)
+
+    with metrics.span("prompt"):
+        text = prompt_budget.assemble(page["blocks"], prompt_budget.ANALYSIS_PAGE_TOKENS)
+        prompt = analysis_prompt(website, text)
+
+    summary = call_claude(prompt, temperature=0.3, max_tokens=500, use_cache=use_cache, hedge=True)
+    analysis_store.put(website, {**page, "text": text}, summary)
+    return {"summary": summary}
+
+
 @app.post("/api/analyse-website")
 def analyse_website():
-    website = request.json.get("website", "").strip()
+    data = request.json
+    website = data.get("website", "").strip()
     if not website:
         return jsonify(error="no website provided"), 400
 
     try:
-        headers = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64)"}
-        resp = requests.get(website, headers=headers, timeout=20)
-        resp.raise_for_status()
-    except requests.RequestException as exc:
+        result = analyse_site(website, use_cache=not _cache_bypass(data))
+    except (requests.RequestException, page_fetch.FetchError, RuntimeError) as exc:
         return jsonify(error=str(exc)), 500
 
-    text = BeautifulSoup(resp.text, "html.parser").get_text(" ", strip=True)[:4000]
-
-    prompt = textwrap.dedent(
-        f"""\nAnalyze the business activities found on **{website}**.\nProvide a concise summary (≤100 words) that includes:\n1. Industry / sector\n2. Main business activities\n3. Products or services offered\n4. Notable insurance‑relevant risks\n\nExtracted text (truncated):\n{text}\n"""
-    )
-
-    try:
-        summary = call_claude(prompt, temperature=0.3, max_tokens=500)
-        return jsonify(ok=True, summary=summary)
-    except RuntimeError as exc:
-        return jsonify(error=str(exc)), 500
+    # The mode a later generate without "mode" resolves to, so the keys match.
+    speculation.start(website, _audit_mode(None), generate_audit_html)
+    return jsonify(ok=True, **result)
 
 
 # ---- file upload -----------------------------------------------------------
@@ -137,80 +404,148 @@ def upload_file():
     if not f:
         return jsonify(error="no file"), 400
     fid = short_id()
-    f.save(TMP_DIR / f"{fid}_{f.filename}")
-    return jsonify(id=fid, filename=f.filename)
+    try:
+        with metrics.span("store"):
+            entry = uploads.store(fid, f.filename, f.stream)
+    except uploads.UploadTooLarge as exc:
+        return jsonify(error=str(exc)), 413
+    with metrics.span("extract_submit"):
+        doc_extract.submit(entry)
+    return jsonify(
+        id=fid,
+        filename=f.filename,
+        sha256=entry["sha256"],
+        size=entry["size"],
+        deduplicated=entry["deduplicated"],
+    )
+
+
+@app.post("/api/upload-file/by-hash")
+def upload_file_by_hash():
+    """Attach a new id to bytes we already hold, so the client can skip the upload."""
+    data = request.get_json(force=True)
+    sha256 = data.get("sha256", "").strip()
+    filename = data.get("filename", "").strip() or sha256
+    if not sha256:
+        return jsonify(error="no sha256 provided"), 400
+
+    fid = short_id()
+    entry = uploads.link(fid, filename, sha256)
+    if entry is None:
+        return jsonify(error="unknown file hash"), 404
+    doc_extract.submit(entry)
+    return jsonify(
+        id=fid,
+        filename=filename,
+        sha256=entry["sha256"],
+        size=entry["size"],
+        deduplicated=True,
+    )
 
 
 # ---- big audit report ------------------------------------------------------
 
-STYLE_AND_SCRIPT = textwrap.dedent('''\
-    <style>
-    /* (truncated for brevity — keep full block from original if needed) */
-    body {font-family: "Segoe UI", Arial, sans-serif;}
-    </style>
-    <script>
-    document.addEventListener("DOMContentLoaded", () => {
-        document.querySelectorAll(".pref-btn").forEach(btn => {
-            btn.addEventListener("click", () => {
-                const group = btn.closest(".pref-button-group");
-                group.querySelectorAll(".pref-btn").forEach(b => {
-                    b.classList.add("btn-unselected");
-                    b.textContent = b.textContent.replace(" ✓", "");
-                });
-                btn.classList.remove("btn-unselected");
-                if (!btn.textContent.includes("✓")) btn.textContent += " ✓";
-            });
-        });
-    });
-    </script>''')
-
-
-def build_audit_prompt(website: str, file_ids: list[str]) -> str:
+def _audit_inputs(website: str, file_ids: list[str]) -> dict:
+    """Website, document list, extracts, stored site analysis and date shared by every audit mode."""
     today = datetime.date.today().strftime("%d %B %Y")
-    file_details = _get_uploaded_files(file_ids)
+    with metrics.span("lookup_uploads"):
+        file_details = _get_uploaded_files(file_ids)
     file_names = [f["filename"] for f in file_details]
     file_list = "\n".join(f"- {name}" for name in file_names) or "No documents uploaded"
 
-    return textwrap.dedent(
-        f'''\
-        You are an expert UK commercial-insurance broker with 30+ years' experience.
+    with metrics.span("extract_wait"):
+        extracts = doc_extract.collect(file_details)
+    document_text = "\n\n".join(
+        f"### {doc['filename']}\n{doc['text']}" for doc in extracts if doc["text"]
+    ) or "No document text available"
+
+    with metrics.span("analysis_lookup"):
+        site_analysis = analysis_store.get(website)
+    if site_analysis:
+        blocks = prompt_budget.blocks_from_text(site_analysis["text"])
+        site_analysis["text"] = prompt_budget.assemble(blocks, prompt_budget.AUDIT_SITE_TOKENS)
+
+    return {
+        "website": website,
+        "file_list": file_list,
+        "document_text": document_text,
+        "today": today,
+        "site_analysis": site_analysis,
+    }
+
 
-        Create a **single stand‑alone HTML document** following the JORO framework.
+def build_audit_prompt(website: str, file_ids: list[str], structured: bool = False) -> str:
+    """Per-request tail of the audit prompt; the template goes in AUDIT_SYSTEM."""
+    inputs = _audit_inputs(website, file_ids)
+    with metrics.span("prompt"):
+        return prompts.get_audit_request(**inputs, structured=structured)
 
-        ━━━━━━━━━━  METADATA  ━━━━━━━━━━
-        Website: {website}
-        Uploaded documents: {file_list}
-        Date: {today}
 
-        ━━━━━━━━━━  CONTENT  ━━━━━━━━━━
-        1. OVERVIEW
-           • Summarise typical insurance coverages for this industry
-           • Explain WHY each coverage exists (no jargon)
+# Stable system prefixes sent with every single-call audit; only the HTML one
+# is long enough to be marked for prompt caching (see prompts).
+AUDIT_SYSTEM = prompts.get_audit_system_blocks()
+AUDIT_JSON_SYSTEM = prompts.get_audit_json_system_blocks()
 
-        2. COVERAGE TABLE
-           • Columns: Coverage | Category | Claim scenario | How to claim | Annual cost range
-           • Include preference buttons under each row (Essential / Interested / Not Interested)
 
-        3. RED FLAGS & REAL‑LIFE SCENARIOS
-           • Identify potential gaps and cite real claim examples
+def _audit_mode(data: dict | None) -> str:
+    mode = str((data or {}).get("mode") or AUDIT_MODE).strip().lower()
+    return mode if mode in AUDIT_MODES else "html"
 
-        4. RECOMMENDED TESTS & CERTIFICATES
-           • List relevant certifications and potential premium savings
 
-        5. BENEFITS OF ADDITIONAL STEPS
-           • Financial, operational, and competitive advantages
+def render_structured_audit(text: str) -> str:
+    """Turn Claude's JSON reply into the final report HTML."""
+    today = datetime.date.today().strftime("%d %B %Y")
+    try:
+        with metrics.span("render"):
+            return report.render(report.parse_report(text), today)
+    except report.ReportFormatError as exc:
+        raise RuntimeError(str(exc)) from exc
+
+
+def audit_request(website: str, file_ids: list[str], structured: bool = False) -> tuple[str, list[dict], int]:
+    """(prompt, system, max_tokens) for a single-call audit."""
+    prompt = build_audit_prompt(website, file_ids, structured=structured)
+    if structured:
+        return prompt, AUDIT_JSON_SYSTEM, AUDIT_JSON_MAX_TOKENS
+    return prompt, AUDIT_SYSTEM, 4000
+
+
+def sections_inputs(website: str, file_ids: list[str]) -> dict:
+    """Keyword arguments for ``audit_sections.generate`` (minus ``call``)."""
+    inputs = _audit_inputs(website, file_ids)
+    hostname = urllib.parse.urlparse(website if "//" in website else f"//{website}").hostname
+    return {
+        "context": prompts.get_audit_context(**inputs),
+        "company": hostname or website,
+        "date": inputs["today"],
+    }
 
-        ━━━━━━━━━━  DESIGN  ━━━━━━━━━━
-        • Table header background: #709fcc; white text
-        • Colour tokens: #4fb57d (green), #f49547 (orange), #ef6460 (red), #B22222 (deep‑red)
-        • Use <h2> for main sections, <h3> with icons for subsections
 
-        Inject the following style & script block into the <head>:
-        {STYLE_AND_SCRIPT}
+def generate_audit_html(website: str, file_ids: list[str], *, mode: str = "html", use_cache: bool = True) -> str:
+    """Produce the audit report in the requested mode."""
+    if mode == "sections":
+        kwargs = sections_inputs(website, file_ids)
+        with metrics.span("sections"):
+            return audit_sections.generate(call=call_claude, use_cache=use_cache, **kwargs)
 
-        Return ONLY valid HTML (no markdown fences).
-        '''
+    prompt, system, max_tokens = audit_request(website, file_ids, structured=mode == "structured")
+    text = call_claude(
+        prompt, system=system, temperature=0.4, max_tokens=max_tokens, use_cache=use_cache,
+        cache_if=report.is_report if mode == "structured" else None,
     )
+    if mode != "structured":
+        return text
+    try:
+        return render_structured_audit(text)
+    except RuntimeError:
+        if not use_cache:
+            raise
+        # A malformed reply may have come from the cache; ask once more fresh.
+        text = call_claude(
+            prompt, system=system, temperature=0.4, max_tokens=max_tokens, use_cache=False,
+            cache_if=report.is_report,
+        )
+        return render_structured_audit(text)
 
 
 @app.post("/api/generate-audit")
@@ -218,16 +553,205 @@ def generate_audit():
     data = request.get_json(force=True)
     website = data.get("website", "").strip()
     file_ids = data.get("files", [])
-
-    prompt = build_audit_prompt(website, file_ids)
+    mode = _audit_mode(data)
+    use_cache = not _cache_bypass(data)
 
     try:
-        html = call_claude(prompt, temperature=0.4, max_tokens=4000)
+        html = use_cache and speculation.attach(website, file_ids, mode)
+        if not html:
+            html = generate_audit_html(website, file_ids, mode=mode, use_cache=use_cache)
         return jsonify(html=html)
     except RuntimeError as exc:
         return jsonify(error=str(exc)), 500
 
 
+# ---- queued audits ---------------------------------------------------------
+
+def _run_audit(website: str, files: list[str], no_cache: bool = False, mode: str = "html") -> str:
+    """Job runner for audit_jobs: the same work generate_audit does inline."""
+    html = not no_cache and speculation.attach(website, files, mode)
+    return html or generate_audit_html(website, files, mode=mode, use_cache=not no_cache)
+
+
+@app.post("/api/audits")
+def submit_audit():
+    data = request.get_json(force=True)
+    website = data.get("website", "").strip()
+    if not website:
+        return jsonify(error="no website provided"), 400
+
+    params = {
+        "website": website,
+        "files": data.get("files", []),
+        "no_cache": _cache_bypass(data),
+        "mode": _audit_mode(data),
+    }
+    try:
+        job = audit_jobs.submit(params)
+    except audit_jobs.QueueFull as exc:
+        return jsonify(error=str(exc)), 429
+    return jsonify(job), 202
+
+
+@app.get("/api/audits/<job_id>")
+def audit_status(job_id):
+    job = audit_jobs.get(job_id)
+    if job is None:
+        return jsonify(error="unknown audit id"), 404
+    return jsonify(job)
+
+
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _sse_response(events) -> Response:
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _speculative_events(website: str, file_ids: list[str], mode: str, use_cache: bool, started: float):
+    """SSE for a matching speculation; evaluates (via ``yield from``) to True on a hit.
+
+    Runs after the ``start`` event, so waiting for an in-flight speculation
+    never delays the first byte.
+    """
+    html = use_cache and speculation.attach(website, file_ids, mode)
+    if not html:
+        return False
+    yield _sse("chunk", {"html": html})
+    elapsed_ms = int((time.monotonic() - started) * 1000)
+    yield _sse("done", {"usage": {}, "elapsed_ms": elapsed_ms, "speculative": True})
+    return True
+
+
+def _stream_sections(website: str, file_ids: list[str], use_cache: bool) -> Response:
+    """Sections mode over SSE: the stitched report arrives as one chunk."""
+    def events():
+        started = time.monotonic()
+        yield _sse("start", {"website": website})
+        try:
+            if (yield from _speculative_events(website, file_ids, "sections", use_cache, started)):
+                return
+            html = generate_audit_html(website, file_ids, mode="sections", use_cache=use_cache)
+            yield _sse("chunk", {"html": html})
+            yield _sse("done", {"usage": {}, "elapsed_ms": int((time.monotonic() - started) * 1000)})
+        except (RuntimeError, requests.RequestException) as exc:
+            yield _sse("error", {"error": str(exc)})
+
+    return _sse_response(events())
+
+
+@app.post("/api/generate-audit/stream")
+def generate_audit_stream():
+    """Same as generate_audit, but forwards HTML chunks as Server-Sent Events.
+
+    In structured mode the JSON is streamed as ``progress`` events and the
+    rendered report is sent as a single chunk once it is complete.
+    """
+    data = request.get_json(force=True)
+    website = data.get("website", "").strip()
+    file_ids = data.get("files", [])
+
+    mode = _audit_mode(data)
+    use_cache = not _cache_bypass(data)
+    if mode == "sections":
+        return _stream_sections(website, file_ids, use_cache)
+
+    structured = mode == "structured"
+
+    def events():
+        started = time.monotonic()
+        # Flush headers straight away so the browser sees the first byte.
+        yield _sse("start", {"website": website})
+        try:
+            if (yield from _speculative_events(website, file_ids, mode, use_cache, started)):
+                return
+            prompt, system, max_tokens = audit_request(website, file_ids, structured=structured)
+            stream = stream_claude(
+                prompt, system=system, temperature=0.4, max_tokens=max_tokens, use_cache=use_cache,
+                cache_if=report.is_report if structured else None,
+            )
+            parts = []
+            for kind, value in stream:
+                if kind == "text" and structured:
+                    parts.append(value)
+                    yield _sse("progress", {"chars": sum(map(len, parts))})
+                elif kind == "text":
+                    yield _sse("chunk", {"html": value})
+                else:
+                    if structured:
+                        yield _sse("chunk", {"html": render_structured_audit("".join(parts))})
+                    elapsed_ms = int((time.monotonic() - started) * 1000)
+                    yield _sse("done", {"usage": value, "elapsed_ms": elapsed_ms})
+        except (RuntimeError, requests.RequestException) as exc:
+            yield _sse("error", {"error": str(exc)})
+
+    return _sse_response(events())
+
+
+# ---- bulk portfolio --------------------------------------------------------
+
+def portfolio_stream(data: dict, use_cache: bool):
+    """NDJSON lines for a portfolio request; raises ``ValueError`` for a bad body."""
+    websites = portfolio.request_sites(data)
+    run_id, checkpoint = portfolio.checkpoint_path(data.get("run_id"))
+    concurrency, rate = portfolio.request_limits(data)
+    return portfolio.stream(
+        websites,
+        run_id=run_id,
+        checkpoint=checkpoint,
+        analyse=analyse_site,
+        audit=generate_audit_html,
+        mode=_audit_mode(data),
+        use_cache=use_cache,
+        concurrency=concurrency,
+        rate=rate,
+    )
+
+
+@app.post("/api/portfolio")
+def audit_portfolio():
+    """Analyse and audit many websites; per-site results stream back as NDJSON.
+
+    Pass the ``run_id`` from the first line to resume an interrupted run.
+    """
+    data = request.get_json(force=True)
+    try:
+        lines = portfolio_stream(data, use_cache=not _cache_bypass(data))
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    return Response(
+        stream_with_context(lines),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---- operational stats -----------------------------------------------------
+@app.get("/api/stats")
+def stats():
+    return jsonify(
+        counters=metrics.snapshot(),
+        http=http_client.reuse_stats(),
+        llm_cache=llm_cache.stats(),
+        uploads=uploads.stats(),
+        audit_jobs=audit_jobs.stats(),
+        analysis_store=analysis_store.stats(),
+        claude=resilience.stats(),
+        speculation=speculation.stats(),
+    )
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    body, content_type = metrics.exposition()
+    return Response(body, content_type=content_type)
+
+
 # ---- CORS pre‑flight catch‑all --------------------------------------------
 @app.route("/api/<path:_dummy>", methods=["OPTIONS"])
 def _options(_dummy):
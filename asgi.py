@@ -0,0 +1,545 @@
+# asgi.py - Async entry point: the same routes with non-blocking outbound calls
+"""
+``app`` is an ASGI application for ``gunicorn -c gunicorn_async.conf.py
+asgi:app``. The routes that spend their time waiting on the network —
+analyse-website, generate-audit and its SSE variant — run natively on the
+event loop with a pooled ``httpx.AsyncClient``, so one worker process can
+hold hundreds of Claude calls open at once. The portfolio route is native
+only so its NDJSON can stream. Every other route (uploads, static files,
+job queue, stats, /metrics) is handed to the Flask app in a worker thread,
+so behaviour stays identical. Their request bodies are spooled to a
+temporary file past ``ASYNC_SPOOL_BYTES``, so an upload is not held in
+memory while Flask streams it to disk.
+
+Blocking helpers the async routes still need (SQLite, document extraction
+waits, the LLM cache) run through ``anyio.to_thread``; ``ASYNC_THREADS``
+sizes that pool.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+import anyio
+import httpx
+
+import analysis_store
+import app as wsgi
+import audit_jobs
+import audit_sections
+import http_client
+import llm_cache
+import metrics
+import page_fetch
+import prompt_budget
+import report
+import resilience
+import speculation
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", "500"))  # per process
+MAX_KEEPALIVE = int(os.getenv("ASYNC_MAX_KEEPALIVE", "100"))
+THREADS = int(os.getenv("ASYNC_THREADS", "64"))
+SPOOL_BYTES = int(os.getenv("ASYNC_SPOOL_BYTES", str(1024 * 1024)))  # bridged bodies beyond this go to disk
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"Content-Type,Authorization"),
+    (b"access-control-allow-methods", b"GET,POST,PUT,DELETE,OPTIONS"),
+]
+
+# ────────── outbound client ──────────────────────────────────────────────────
+
+_client: httpx.AsyncClient | None = None
+_client_pid: int | None = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE),
+            timeout=httpx.Timeout(http_client.READ_TIMEOUT, connect=http_client.CONNECT_TIMEOUT),
+            follow_redirects=True,
+        )
+        _client_pid = os.getpid()
+    return _client
+
+
+async def fetch_page_text(url: str, max_chars: int = 4000) -> dict:
+    """Async ``page_fetch.fetch_page_text``; network errors raise ``httpx.HTTPError``."""
+    timeout = httpx.Timeout(page_fetch.FETCH_TIMEOUT, connect=http_client.CONNECT_TIMEOUT)
+    async with _get_client().stream("GET", url, headers=page_fetch.REQUEST_HEADERS, timeout=timeout) as resp:
+        resp.raise_for_status()
+        reader = page_fetch.PageReader(resp.headers.get("content-type", "text/html"), max_chars)
+        exhausted = True
+        async for chunk in resp.aiter_bytes(page_fetch.CHUNK_SIZE):
+            if reader.feed(chunk):
+                exhausted = False
+                break
+        return reader.result(str(resp.url), resp.status_code, exhausted=exhausted)
+
+
+async def call_claude(
+    prompt: str | list[dict],
+    *,
+    system: str | list[dict] | None = None,
+    temperature: float = 0.3,
+    max_tokens: int | None = None,
+    use_cache: bool = True,
+    hedge: bool = False,
+    cache_if=None,
+) -> str:
+    """Async ``app.call_claude``: same cache, resilience policies and metrics."""
+    headers, data = wsgi._claude_request(prompt, temperature, max_tokens, system)
+
+    key = wsgi._cache_key(data)
+    if use_cache:
+        cached = await anyio.to_thread.run_sync(llm_cache.get, key)
+        if cached is not None:
+            print(f"[Claude] cache hit {key[:12]} | {len(cached)} chars")
+            return cached
+
+    chars, tokens = wsgi._prompt_size(data)
+    print(f"[Claude] → prompt length: {chars} chars (~{tokens} tokens) | max_tokens={data['max_tokens']}")
+
+    async def post() -> dict:
+        resp = await resilience.send_async(
+            lambda: _get_client().post(wsgi.CLAUDE_URL, headers=headers, json=data),
+            estimated_tokens=tokens,
+        )
+        print(f"[Claude] ← status {resp.status_code}")
+        if resp.status_code != 200:
+            raise RuntimeError(f"Claude API error {resp.status_code}: {resp.text}")
+        return resp.json()
+
+    with metrics.claude_call():
+        if hedge:
+            payload = await resilience.hedged_async(f"claude-{data['max_tokens']}", post)
+        else:
+            payload = await post()
+    text = wsgi._response_text(payload, tokens)
+    if cache_if is None or cache_if(text):
+        await anyio.to_thread.run_sync(llm_cache.put, key, text)
+    return text
+
+
+async def stream_claude(
+    prompt: str | list[dict],
+    *,
+    system: str | list[dict] | None = None,
+    temperature: float = 0.3,
+    max_tokens: int | None = None,
+    use_cache: bool = True,
+    cache_if=None,
+):
+    """Async ``app.stream_claude``: yields ("text", str) deltas then ("usage", dict)."""
+    headers, data = wsgi._claude_request(prompt, temperature, max_tokens, system, stream=True)
+
+    key = wsgi._cache_key(data)
+    if use_cache:
+        cached = await anyio.to_thread.run_sync(llm_cache.get, key)
+        if cached is not None:
+            print(f"[Claude] cache hit {key[:12]} | {len(cached)} chars")
+            yield "text", cached
+            yield "usage", {"cache_hit": True}
+            return
+
+    chars, tokens = wsgi._prompt_size(data)
+    print(f"[Claude] → streaming prompt length: {chars} chars (~{tokens} tokens) | max_tokens={data['max_tokens']}")
+    client = _get_client()
+    resp = await resilience.send_async(
+        lambda: client.send(client.build_request("POST", wsgi.CLAUDE_URL, headers=headers, json=data), stream=True),
+        estimated_tokens=tokens,
+    )
+    try:
+        with metrics.claude_call():
+            print(f"[Claude] ← stream status {resp.status_code}")
+            if resp.status_code != 200:
+                await resp.aread()
+                raise RuntimeError(f"Claude API error {resp.status_code}: {resp.text}")
+
+            usage = {"stop_reason": None}
+            parts = []
+            async for line in resp.aiter_lines():
+                text = wsgi._stream_delta(line, usage)
+                if text:
+                    parts.append(text)
+                    yield "text", text
+    finally:
+        await resp.aclose()
+
+    wsgi._log_usage(usage, tokens)
+    text = "".join(parts)
+    if cache_if is None or cache_if(text):
+        await anyio.to_thread.run_sync(llm_cache.put, key, text)
+    yield "usage", usage
+
+
+# ────────── audits ───────────────────────────────────────────────────────────
+
+async def generate_audit_html(website: str, file_ids: list[str], *, mode: str = "html", use_cache: bool = True) -> str:
+    """Async ``app.generate_audit_html``."""
+    if mode == "sections":
+        kwargs = await anyio.to_thread.run_sync(wsgi.sections_inputs, website, file_ids)
+        with metrics.span("sections"):
+            return await audit_sections.generate_async(call=call_claude, use_cache=use_cache, **kwargs)
+
+    prompt, system, max_tokens = await anyio.to_thread.run_sync(
+        wsgi.audit_request, website, file_ids, mode == "structured"
+    )
+    text = await call_claude(
+        prompt, system=system, temperature=0.4, max_tokens=max_tokens, use_cache=use_cache,
+        cache_if=report.is_report if mode == "structured" else None,
+    )
+    if mode != "structured":
+        return text
+    try:
+        return wsgi.render_structured_audit(text)
+    except RuntimeError:
+        if not use_cache:
+            raise
+        # A malformed reply may have come from the cache; ask once more fresh.
+        text = await call_claude(
+            prompt, system=system, temperature=0.4, max_tokens=max_tokens, use_cache=False,
+            cache_if=report.is_report,
+        )
+        return wsgi.render_structured_audit(text)
+
+
+# ────────── native routes ────────────────────────────────────────────────────
+
+class BadRequest(Exception):
+    """The request body is not a JSON object."""
+
+
+class Request:
+    def __init__(self, scope: dict, body: bytes):
+        self.scope = scope
+        self.body = body
+        self.headers = {k.decode("latin1").lower(): v.decode("latin1") for k, v in scope["headers"]}
+
+    def json(self) -> dict:
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError as exc:
+            raise BadRequest(f"invalid JSON body: {exc}") from exc
+        if not isinstance(data, dict):
+            raise BadRequest("request body must be a JSON object")
+        return data
+
+    def cache_bypass(self, data: dict) -> bool:
+        """Same rule as ``app._cache_bypass``."""
+        return "no-cache" in self.headers.get("cache-control", "") or bool(data.get("no_cache"))
+
+
+class EventStream:
+    """A route result that is streamed: Server-Sent Events unless ``media_type`` says otherwise."""
+
+    def __init__(self, events, media_type: str = "text/event-stream; charset=utf-8"):
+        self.events = events
+        self.media_type = media_type
+
+
+async def analyse_website(req: Request):
+    data = req.json()
+    website = (data.get("website") or "").strip()
+    if not website:
+        return 400, {"error": "no website provided"}
+
+    use_cache = not req.cache_bypass(data)
+    if use_cache:
+        with metrics.span("analysis_lookup"):
+            stored = await anyio.to_thread.run_sync(analysis_store.get, website)
+        if stored and stored["summary"]:
+            await anyio.to_thread.run_sync(speculation.start, website, wsgi._audit_mode(None), wsgi.generate_audit_html)
+            return 200, {"ok": True, "summary": stored["summary"], "cached": True}
+
+    try:
+        with metrics.span("fetch"):
+            page = await fetch_page_text(website, max_chars=page_fetch.SCAN_CHARS)
+    except (httpx.HTTPError, page_fetch.FetchError) as exc:
+        return 500, {"error": str(exc)}
+
+    with metrics.span("prompt"):
+        text = prompt_budget.assemble(page["blocks"], prompt_budget.ANALYSIS_PAGE_TOKENS)
+        prompt = wsgi.analysis_prompt(website, text)
+
+    try:
+        summary = await call_claude(prompt, temperature=0.3, max_tokens=500, use_cache=use_cache, hedge=True)
+    except (RuntimeError, httpx.HTTPError) as exc:
+        return 500, {"error": str(exc)}
+
+    await anyio.to_thread.run_sync(analysis_store.put, website, {**page, "text": text}, summary)
+    # The speculative audit itself runs on the sync path, in speculation's own pool.
+    await anyio.to_thread.run_sync(speculation.start, website, wsgi._audit_mode(None), wsgi.generate_audit_html)
+    return 200, {"ok": True, "summary": summary}
+
+
+async def generate_audit(req: Request):
+    data = req.json()
+    website = (data.get("website") or "").strip()
+    file_ids = data.get("files", [])
+    mode = wsgi._audit_mode(data)
+    use_cache = not req.cache_bypass(data)
+    try:
+        html = use_cache and await anyio.to_thread.run_sync(speculation.attach, website, file_ids, mode)
+        if not html:
+            html = await generate_audit_html(website, file_ids, mode=mode, use_cache=use_cache)
+        return 200, {"html": html}
+    except (RuntimeError, httpx.HTTPError) as exc:
+        return 500, {"error": str(exc)}
+
+
+async def generate_audit_stream(req: Request):
+    """Async ``app.generate_audit_stream``; same event sequence."""
+    data = req.json()
+    website = (data.get("website") or "").strip()
+    file_ids = data.get("files", [])
+    mode = wsgi._audit_mode(data)
+    use_cache = not req.cache_bypass(data)
+    structured = mode == "structured"
+
+    async def events():
+        started = time.monotonic()
+        yield wsgi._sse("start", {"website": website})
+        try:
+            # After "start", so waiting on an in-flight speculation never delays the first byte.
+            speculative = use_cache and await anyio.to_thread.run_sync(speculation.attach, website, file_ids, mode)
+            if speculative:
+                yield wsgi._sse("chunk", {"html": speculative})
+                elapsed_ms = int((time.monotonic() - started) * 1000)
+                yield wsgi._sse("done", {"usage": {}, "elapsed_ms": elapsed_ms, "speculative": True})
+                return
+            if mode == "sections":
+                html = await generate_audit_html(website, file_ids, mode="sections", use_cache=use_cache)
+                yield wsgi._sse("chunk", {"html": html})
+                yield wsgi._sse("done", {"usage": {}, "elapsed_ms": int((time.monotonic() - started) * 1000)})
+                return
+
+            prompt, system, max_tokens = await anyio.to_thread.run_sync(
+                wsgi.audit_request, website, file_ids, structured
+            )
+            stream = stream_claude(
+                prompt, system=system, temperature=0.4, max_tokens=max_tokens, use_cache=use_cache,
+                cache_if=report.is_report if structured else None,
+            )
+            parts = []
+            async for kind, value in stream:
+                if kind == "text" and structured:
+                    parts.append(value)
+                    yield wsgi._sse("progress", {"chars": sum(map(len, parts))})
+                elif kind == "text":
+                    yield wsgi._sse("chunk", {"html": value})
+                else:
+                    if structured:
+                        yield wsgi._sse("chunk", {"html": wsgi.render_structured_audit("".join(parts))})
+                    elapsed_ms = int((time.monotonic() - started) * 1000)
+                    yield wsgi._sse("done", {"usage": value, "elapsed_ms": elapsed_ms})
+        except (RuntimeError, httpx.HTTPError) as exc:
+            yield wsgi._sse("error", {"error": str(exc)})
+
+    return EventStream(events())
+
+
+async def audit_portfolio(req: Request):
+    """``app.audit_portfolio``: each site runs on the sync pipeline in portfolio's pool."""
+    data = req.json()
+    try:
+        lines = wsgi.portfolio_stream(data, use_cache=not req.cache_bypass(data))
+    except ValueError as exc:
+        return 400, {"error": str(exc)}
+
+    async def chunks():
+        try:
+            while (line := await anyio.to_thread.run_sync(next, lines, None)) is not None:
+                yield line
+        finally:
+            lines.close()
+
+    return EventStream(chunks(), media_type="application/x-ndjson")
+
+
+ROUTES = {
+    ("POST", "/api/analyse-website"): analyse_website,
+    ("POST", "/api/generate-audit"): generate_audit,
+    ("POST", "/api/generate-audit/stream"): generate_audit_stream,
+    ("POST", "/api/portfolio"): audit_portfolio,
+}
+
+
+# ────────── ASGI plumbing ────────────────────────────────────────────────────
+
+async def _read_body(receive, limit: int) -> bytes | None:
+    """The request body, or None once it passes ``limit`` bytes."""
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _spool_body(receive, limit: int):
+    """(file, size) for a bridged request body; stops storing once it passes ``limit``."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size <= limit:
+            spool.write(chunk)
+        if not message.get("more_body"):
+            spool.seek(0)
+            return spool, size
+
+
+async def _send_json(send, status: int, payload: dict) -> None:
+    body = json.dumps(payload).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *CORS_HEADERS]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_events(send, events, media_type: str) -> None:
+    headers = [
+        (b"content-type", media_type.encode()),
+        (b"cache-control", b"no-cache"),
+        (b"x-accel-buffering", b"no"),
+        *CORS_HEADERS,
+    ]
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    try:
+        async for chunk in events:
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+    finally:
+        await events.aclose()
+    await send({"type": "http.response.body", "body": b""})
+
+
+def _environ(scope: dict, body) -> dict:
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope["headers"]:
+        name = raw_name.decode("latin1").upper().replace("-", "_")
+        value = raw_value.decode("latin1")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+            if name in environ:
+                value = f"{environ[name]},{value}"
+        environ[name] = value
+    return environ
+
+
+def _call_wsgi(environ: dict) -> tuple[int, list, bytes]:
+    started: dict = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"], started["headers"] = int(status.split(" ", 1)[0]), headers
+
+    result = wsgi.app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return started["status"], started["headers"], body
+
+
+async def _wsgi_bridge(scope: dict, receive, send) -> None:
+    """Serve a non-native route with the Flask app on a worker thread."""
+    headers = dict(scope["headers"])
+    declared = int(headers.get(b"content-length") or 0)
+    limit = wsgi.app.config["MAX_CONTENT_LENGTH"]
+    # Oversized uploads: let Flask answer 413 from Content-Length without reading them.
+    if declared > limit:
+        body, size = tempfile.SpooledTemporaryFile(), declared
+    else:
+        body, size = await _spool_body(receive, limit)
+
+    environ = _environ(scope, body)
+    environ["CONTENT_LENGTH"] = str(size)  # chunked bodies too; over the limit, Flask answers 413
+    try:
+        status, response_headers, payload = await anyio.to_thread.run_sync(_call_wsgi, environ)
+    finally:
+        body.close()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in response_headers],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            anyio.to_thread.current_default_thread_limiter().total_tokens = THREADS
+            audit_jobs.start(wsgi._run_audit)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _client is not None and _client_pid == os.getpid():
+                await _client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    handler = ROUTES.get((scope["method"], scope["path"]))
+    if handler is None:
+        return await _wsgi_bridge(scope, receive, send)
+
+    # Same cap the Flask routes get from MAX_CONTENT_LENGTH.
+    limit = wsgi.app.config["MAX_CONTENT_LENGTH"]
+    declared = int(dict(scope["headers"]).get(b"content-length") or 0)
+    body = None if declared > limit else await _read_body(receive, limit)
+    if body is None:
+        return await _send_json(send, 413, {"error": f"request body exceeds {limit / (1024 * 1024):g} MB limit"})
+
+    req = Request(scope, body)
+    metrics.start_request(handler.__name__)
+    status = 500
+    try:
+        try:
+            result = await handler(req)
+        except BadRequest as exc:
+            result = 400, {"error": str(exc)}
+        if isinstance(result, EventStream):
+            status = 200
+            await _send_events(send, result.events, result.media_type)
+        else:
+            status, payload = result
+            await _send_json(send, status, payload)
+    finally:
+        metrics.finish_request(status)
@@ -0,0 +1,215 @@
+# audit_jobs.py - Persisted audit job queue with a bounded runner pool
+"""
+``submit`` stores a job in SQLite and returns immediately. Runner threads in
+every process poll the table and claim queued jobs one at a time, so the
+number of audits talking to Claude at once is capped across *all* gunicorn
+workers by ``AUDIT_JOB_CONCURRENCY``, not per process.
+
+Results stay in the table for ``AUDIT_JOB_TTL`` seconds so any worker can
+answer a poll. Set ``AUDIT_JOB_RUNNERS=0`` on the web tier and run
+``audit_worker.py`` to keep audits off the web processes entirely.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+
+import metrics
+import storage
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+RUNNERS = int(os.getenv("AUDIT_JOB_RUNNERS", "2"))  # threads per process
+CONCURRENCY = int(os.getenv("AUDIT_JOB_CONCURRENCY", "4"))  # across all processes
+QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "100"))
+JOB_TIMEOUT = int(os.getenv("AUDIT_JOB_TIMEOUT", "300"))
+TTL = int(os.getenv("AUDIT_JOB_TTL", str(24 * 3600)))
+POLL_INTERVAL = 0.5
+
+_DB = "audit_jobs.db"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    result      TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class QueueFull(Exception):
+    """More than ``AUDIT_QUEUE_MAX`` jobs are already waiting."""
+
+
+def _db():
+    return storage.connect(_DB, _SCHEMA)
+
+
+def queue_depth() -> int:
+    return _db().execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+
+def running_count() -> int:
+    return _db().execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+
+
+# ────────── producer side ────────────────────────────────────────────────────
+
+def submit(params: dict) -> dict:
+    """Queue a job and wake a local runner; raises ``QueueFull`` when saturated."""
+    depth = queue_depth()
+    if depth >= QUEUE_MAX:
+        metrics.incr("audit_jobs_rejected")
+        raise QueueFull(f"audit queue is full ({depth} waiting)")
+
+    job_id = uuid.uuid4().hex
+    _db().execute(
+        "INSERT INTO jobs (id, status, params, created_at) VALUES (?, 'queued', ?, ?)",
+        (job_id, json.dumps(params), time.time()),
+    )
+    metrics.incr("audit_jobs_submitted")
+    _wake.set()
+    return {"id": job_id, "status": "queued", "queue_depth": depth + 1}
+
+
+def get(job_id: str) -> dict | None:
+    row = _db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = {
+        "id": row["id"],
+        "status": row["status"],
+        "created_at": row["created_at"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"],
+    }
+    if row["status"] == "queued":
+        job["position"] = _db().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at <= ?",
+            (row["created_at"],),
+        ).fetchone()[0]
+    elif row["status"] == "done":
+        job["html"] = row["result"]
+    elif row["status"] == "failed":
+        job["error"] = row["error"]
+    return job
+
+
+# ────────── runner side ──────────────────────────────────────────────────────
+
+def _claim() -> tuple[str, dict] | None:
+    """Move the oldest queued job to running if the global cap allows it."""
+    conn = _db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+        if running >= CONCURRENCY:
+            return None
+        row = conn.execute(
+            "SELECT id, params FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?",
+            (time.time(), row["id"]),
+        )
+        return row["id"], json.loads(row["params"])
+    finally:
+        conn.execute("COMMIT")
+
+
+def _finish(job_id: str, *, result: str | None = None, error: str | None = None) -> None:
+    _db().execute(
+        "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+        ("failed" if error else "done", result, error, time.time(), job_id),
+    )
+
+
+def _housekeeping(now: float) -> None:
+    """Fail jobs whose runner died mid-flight and drop expired results."""
+    conn = _db()
+    lost = conn.execute(
+        "UPDATE jobs SET status = 'failed', error = 'job timed out', finished_at = ? "
+        "WHERE status = 'running' AND started_at < ?",
+        (now, now - JOB_TIMEOUT),
+    ).rowcount
+    if lost:
+        metrics.incr("audit_jobs_lost", lost)
+    conn.execute(
+        "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (now - TTL,)
+    )
+
+
+def _run_one(runner) -> bool:
+    """Claim and run a single job; False when there was nothing to do."""
+    claimed = _claim()
+    if claimed is None:
+        return False
+
+    job_id, params = claimed
+    started = time.monotonic()
+    try:
+        _finish(job_id, result=runner(**params))
+        metrics.incr("audit_jobs_done")
+    except Exception as exc:
+        _finish(job_id, error=str(exc))
+        metrics.incr("audit_jobs_failed")
+    elapsed = time.monotonic() - started
+    metrics.incr("audit_job_seconds_total", elapsed)
+    print(f"[Jobs] {job_id[:12]} finished in {elapsed:.1f}s | queue depth {queue_depth()}")
+    return True
+
+
+def run_forever(runner) -> None:
+    """Runner loop: poll for work, sleeping on ``_wake`` when the queue is idle."""
+    last_housekeeping = 0.0
+    while True:
+        try:
+            now = time.time()
+            if now - last_housekeeping > 60:
+                _housekeeping(now)
+                last_housekeeping = now
+            if _run_one(runner):
+                continue
+        except Exception as exc:  # e.g. "database is locked"; keep the runner alive
+            print(f"[Jobs] runner error: {exc}")
+        _wake.wait(POLL_INTERVAL)
+        _wake.clear()
+
+
+_wake = threading.Event()
+_started_pid: int | None = None
+_start_lock = threading.Lock()
+
+
+def start(runner, threads: int = RUNNERS) -> None:
+    """Start ``threads`` daemon runners in this process (once per PID).
+
+    ``runner(**params)`` must return the finished HTML for a job.
+    """
+    global _started_pid
+    with _start_lock:
+        if _started_pid == os.getpid():
+            return
+        _started_pid = os.getpid()
+        for n in range(threads):
+            threading.Thread(
+                target=run_forever, args=(runner,), name=f"audit-runner-{n}", daemon=True
+            ).start()
+
+
+def stats() -> dict:
+    return {
+        "queue_depth": queue_depth(),
+        "running": running_count(),
+        "concurrency_limit": CONCURRENCY,
+        "queue_limit": QUEUE_MAX,
+    }
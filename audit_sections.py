@@ -0,0 +1,152 @@
+# audit_sections.py - Parallel per-section audit generation
+"""
+Sections mode fans the five JORO sections out as concurrent Claude requests
+that share one business-context header, then stitches the fragments into
+the template skeleton in order. Wall-clock time is roughly the slowest
+section rather than the sum of all five, and each section gets its own
+``max_tokens`` budget instead of competing for one.
+
+A section that errors or misses ``AUDIT_SECTION_TIMEOUT`` is retried once
+with a shorter brief and half the tokens; if that also fails a placeholder
+is rendered so the rest of the report still arrives. Both timeouts run from
+when an attempt starts. Each audit gets its own small thread pool, with
+room for every section and its retry, so concurrent audits never queue
+behind each other. ``generate_async`` is the same fan-out as anyio tasks,
+for the async app.
+"""
+
+import contextvars
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import anyio
+
+import metrics
+import prompts
+import report
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+SECTION_TIMEOUT = float(os.getenv("AUDIT_SECTION_TIMEOUT", "45"))
+RETRY_TIMEOUT = float(os.getenv("AUDIT_SECTION_RETRY_TIMEOUT", "20"))
+
+SECTION_MAX_TOKENS = {
+    "overview": 700,
+    "coverage": 2500,
+    "red_flags": 900,
+    "certificates": 700,
+    "benefits": 700,
+}
+
+FAILED_SECTION_HTML = '<p class="orange-text">This section could not be generated in time. Please regenerate the report.</p>'
+
+_FENCE = re.compile(r"^```(?:html)?\s*|\s*```$")
+
+def _clean(fragment: str) -> str:
+    return _FENCE.sub("", fragment.strip())
+
+
+def _wait(futures: dict, started: dict, timeout: float) -> None:
+    """Wait until every future is done or has run ``timeout`` from its own start."""
+    while True:
+        now = time.monotonic()
+        # Not started yet: its clock has not begun.
+        deadlines = [started.get(section, now) + timeout for section, f in futures.items() if not f.done()]
+        if not deadlines or max(deadlines) <= now:
+            return
+        pending = [f for f in futures.values() if not f.done()]
+        wait(pending, timeout=max(deadlines) - now, return_when=FIRST_COMPLETED)
+
+
+def _section_request(section: str, brief: bool) -> tuple[str, int]:
+    """(prompt, max_tokens) for one section attempt."""
+    prompt = prompts.get_audit_section_request(section, brief=brief)
+    return prompt, SECTION_MAX_TOKENS[section] // (2 if brief else 1)
+
+
+def generate(context: str, call, *, company: str, date: str, use_cache: bool = True) -> str:
+    """Generate every section concurrently and return the stitched report.
+
+    ``call`` is ``app.call_claude`` (passed in to avoid a circular import).
+    """
+    system = prompts.get_audit_section_system_blocks(context)
+    pool = ThreadPoolExecutor(max_workers=2 * len(report.SECTIONS), thread_name_prefix="audit-section")
+    started = time.monotonic()
+    attempt_started: dict[bool, dict[str, float]] = {False: {}, True: {}}
+
+    def run(section: str, brief: bool) -> str:
+        attempt_started[brief][section] = time.monotonic()
+        prompt, max_tokens = _section_request(section, brief)
+        return _clean(call(prompt, system=system, temperature=0.4, max_tokens=max_tokens, use_cache=use_cache))
+
+    def submit(section: str, brief: bool):
+        # Carry the request's context so section tokens land on its RequestTimer.
+        return pool.submit(contextvars.copy_context().run, run, section, brief)
+
+    sections, retries = {}, {}
+    try:
+        futures = {section: submit(section, False) for section in report.SECTIONS}
+        _wait(futures, attempt_started[False], SECTION_TIMEOUT)
+        for section, future in futures.items():
+            if future.done() and future.exception() is None:
+                sections[section] = future.result()
+            else:
+                reason = "timeout" if not future.done() else f"error: {future.exception()}"
+                future.cancel()
+                print(f"[Sections] {section} failed ({reason}) – retrying brief")
+                metrics.incr("audit_section_retries")
+                retries[section] = submit(section, True)
+
+        if retries:
+            _wait(retries, attempt_started[True], RETRY_TIMEOUT)
+            for section, future in retries.items():
+                if future.done() and future.exception() is None:
+                    sections[section] = future.result()
+                else:
+                    future.cancel()
+                    metrics.incr("audit_section_failures")
+                    sections[section] = FAILED_SECTION_HTML
+    finally:
+        # Timed-out calls finish in the background; nothing new may start.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.monotonic() - started
+    print(f"[Sections] {len(sections)} sections in {elapsed:.1f}s | {len(retries)} retried")
+    return report.stitch(sections, company, date)
+
+
+async def generate_async(context: str, call, *, company: str, date: str, use_cache: bool = True) -> str:
+    """``generate`` with ``call`` as a coroutine function (``asgi.call_claude``)."""
+    system = prompts.get_audit_section_system_blocks(context)
+    started = time.monotonic()
+    sections: dict[str, str] = {}
+    retried = 0
+
+    async def run(section: str) -> None:
+        nonlocal retried
+        for brief, timeout in ((False, SECTION_TIMEOUT), (True, RETRY_TIMEOUT)):
+            prompt, max_tokens = _section_request(section, brief)
+            reason = "timeout"
+            with anyio.move_on_after(timeout):
+                try:
+                    text = await call(prompt, system=system, temperature=0.4, max_tokens=max_tokens, use_cache=use_cache)
+                    sections[section] = _clean(text)
+                    return
+                except Exception as exc:
+                    reason = f"error: {exc}"
+            if not brief:
+                print(f"[Sections] {section} failed ({reason}) – retrying brief")
+                metrics.incr("audit_section_retries")
+                retried += 1
+        metrics.incr("audit_section_failures")
+        sections[section] = FAILED_SECTION_HTML
+
+    async with anyio.create_task_group() as tg:
+        for section in report.SECTIONS:
+            tg.start_soon(run, section)
+
+    elapsed = time.monotonic() - started
+    print(f"[Sections] {len(sections)} sections in {elapsed:.1f}s | {retried} retried")
+    return report.stitch(sections, company, date)
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""Standalone audit job runner.
+
+Run this next to gunicorn (started with AUDIT_JOB_RUNNERS=0) so queued
+audits never occupy web worker processes:
+
+    AUDIT_JOB_RUNNERS=0 gunicorn app:app
+    AUDIT_JOB_RUNNERS=4 python audit_worker.py
+"""
+
+import threading
+
+import audit_jobs
+from app import _run_audit
+
+if __name__ == "__main__":
+    print(f"[Jobs] worker started | {audit_jobs.RUNNERS} runners | concurrency cap {audit_jobs.CONCURRENCY}")
+    audit_jobs.start(_run_audit)
+    threading.Event().wait()
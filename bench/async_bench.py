@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Compare sync gunicorn workers with the async app under the same load.
+
+Runs ``load_bench.run`` twice against identical fake Claude / fixture
+settings — ``app:app`` with sync workers, then ``asgi:app`` with
+``gunicorn_async.conf.py`` — and prints the results side by side.
+
+    python bench/async_bench.py                      # 2 workers each, 64 in flight
+    python bench/async_bench.py -c 200 -n 400 --latency 2
+"""
+
+import argparse
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+import load_bench  # noqa: E402
+
+SETUPS = {
+    "sync": {"app": "app:app", "config": "gunicorn.conf.py", "worker_class": "sync"},
+    "async": {"app": "asgi:app", "config": "gunicorn_async.conf.py", "worker_class": None},
+}
+
+
+def main() -> None:
+    parser = load_bench.build_parser()
+    parser.set_defaults(concurrency=64, requests=128)
+    args = parser.parse_args()
+    if args.target:
+        sys.exit("async_bench starts its own servers; use load_bench.py --target instead")
+
+    results = {}
+    for name, setup in SETUPS.items():
+        print(f"running {name} ({setup['app']}) ...", flush=True)
+        results[name] = load_bench.run(argparse.Namespace(**{**vars(args), **setup}))
+
+    print(f"\nworkers={args.workers} threads={args.threads} concurrency={args.concurrency} "
+          f"requests={args.requests} fake latency={args.latency}s")
+    header = f"{'req/s':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'err':>4}"
+    print(f"{'endpoint':18} | {'sync':^36} | {'async':^36}")
+    print(f"{'':18} | {header} | {header}")
+    for endpoint in args.endpoints:
+        cells = []
+        for name in SETUPS:
+            r = results[name][endpoint]
+            cells.append(f"{r['rps']:7.1f} {r['p50']:7.0f} {r['p95']:7.0f} {r['p99']:7.0f} {r['errors']:4d}")
+        print(f"{endpoint:18} | {cells[0]} | {cells[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: BeautifulSoup get_text() vs page_fetch.extract_text().
+
+Runs both extraction paths over a corpus of saved pages and reports median
+wall time and peak allocated memory per page.
+
+    python bench/extract_bench.py                 # bench/pages/*.html
+    python bench/extract_bench.py saved/ -n 50    # your own corpus
+"""
+
+import argparse
+import pathlib
+import statistics
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import page_fetch  # noqa: E402
+
+MAX_CHARS = 4000
+
+
+def soup_path(html: str) -> str:
+    """The original analyse_website extraction."""
+    return BeautifulSoup(html, "html.parser").get_text(" ", strip=True)[:MAX_CHARS]
+
+
+def streaming_path(html: str) -> str:
+    return page_fetch.extract_text(html, MAX_CHARS)
+
+
+def measure(fn, html: str, runs: int) -> tuple[float, float]:
+    """Return (median ms, peak KiB) for ``fn(html)``."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(html)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    fn(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="?", default=pathlib.Path(__file__).parent / "pages", type=pathlib.Path)
+    parser.add_argument("-n", "--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = sorted(args.corpus.glob("*.htm*"))
+    if not pages:
+        sys.exit(f"no .html files in {args.corpus}")
+
+    print(f"{'page':32} {'KiB':>6} | {'soup ms':>8} {'soup KiB':>9} | {'stream ms':>9} {'stream KiB':>10} | speedup")
+    totals = {"soup": 0.0, "stream": 0.0}
+    for path in pages:
+        html = path.read_text(encoding="utf-8", errors="replace")
+        soup_ms, soup_kib = measure(soup_path, html, args.runs)
+        stream_ms, stream_kib = measure(streaming_path, html, args.runs)
+        totals["soup"] += soup_ms
+        totals["stream"] += stream_ms
+        print(
+            f"{path.name[:32]:32} {len(html) / 1024:6.0f} | {soup_ms:8.2f} {soup_kib:9.0f} | "
+            f"{stream_ms:9.2f} {stream_kib:10.0f} | {soup_ms / stream_ms:6.1f}x"
+        )
+
+    print(f"\ntotal median ms: soup {totals['soup']:.1f} | stream {totals['stream']:.1f} "
+          f"| {totals['soup'] / totals['stream']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
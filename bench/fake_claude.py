@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Anthropic Messages API, for load tests.
+
+Answers ``POST /v1/messages`` with generated text after a configurable
+time-to-first-token and output token rate, supports ``"stream": true``
+(SSE, same event shapes as the real API), and can inject 429/529 errors.
+Requests whose system prompt asks for the JSON report get a valid report
+object so structured mode renders.
+
+    python bench/fake_claude.py --port 8101 --latency 0.8 --tokens-per-sec 200
+    CLAUDE_API_URL=http://127.0.0.1:8101/v1/messages gunicorn app:app
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "liability cover premium excess policy indemnity risk claim employer public "
+    "professional property business interruption cyber contents tools stock"
+).split()
+
+REPORT = {
+    "company": "Benchmark Ltd",
+    "overview": ["A synthetic business used for load testing."],
+    "coverage": [
+        {
+            "coverage": "Public Liability",
+            "level": "high",
+            "category": "Recommended",
+            "scenario": "A visitor slips on site.",
+            "claim": "£25,000",
+            "cost": "£300 per year",
+        }
+    ],
+    "red_flags": [{"title": "Underinsurance", "detail": "Sums insured look low.", "example": ""}],
+    "certificates": [{"name": "ISO 9001", "detail": "Quality management.", "saving": "5%"}],
+    "benefits": [{"heading": "Peace of mind", "points": ["One broker for every policy."]}],
+}
+
+_counter_lock = threading.Lock()
+_request_count = 0
+
+
+def _system_text(body: dict) -> str:
+    system = body.get("system") or ""
+    if isinstance(system, list):
+        return " ".join(block.get("text", "") for block in system)
+    return system
+
+
+def _reply(body: dict, output_tokens: int) -> tuple[str, int]:
+    """(text, tokens) for a request, honouring ``max_tokens``."""
+    tokens = min(output_tokens, body.get("max_tokens", output_tokens))
+    if '"red_flags"' in _system_text(body):
+        return json.dumps(REPORT), tokens
+    return " ".join(random.choice(WORDS) for _ in range(tokens)), tokens
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeClaude"
+
+    def log_message(self, *args):  # keep benchmark output readable
+        pass
+
+    def _json(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _sse(self, event: str, payload: dict) -> None:
+        chunk = f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode()
+        self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        global _request_count
+        opts = self.server.opts
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+        with _counter_lock:
+            _request_count += 1
+
+        roll = random.random()
+        if roll < opts.rate_429:
+            return self._json(
+                429,
+                {"type": "error", "error": {"type": "rate_limit_error", "message": "fake 429"}},
+                {"retry-after": str(opts.retry_after)},
+            )
+        if roll < opts.rate_429 + opts.rate_529:
+            return self._json(529, {"type": "error", "error": {"type": "overloaded_error", "message": "fake 529"}})
+
+        text, tokens = _reply(body, opts.output_tokens)
+        input_tokens = len(json.dumps(body)) // 4
+        usage = {"input_tokens": input_tokens, "output_tokens": tokens,
+                 "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+        time.sleep(opts.latency)
+
+        if not body.get("stream"):
+            time.sleep(tokens / opts.tokens_per_sec)
+            return self._json(200, {
+                "id": "msg_fake", "type": "message", "role": "assistant", "model": body.get("model"),
+                "content": [{"type": "text", "text": text}], "stop_reason": "end_turn", "usage": usage,
+            })
+
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+        self._sse("message_start", {"type": "message_start", "message": {"usage": {**usage, "output_tokens": 1}}})
+        self._sse("content_block_start", {"type": "content_block_start", "index": 0,
+                                          "content_block": {"type": "text", "text": ""}})
+        pieces = text.split(" ")
+        per_piece = tokens / opts.tokens_per_sec / max(len(pieces), 1)
+        for n, piece in enumerate(pieces):
+            time.sleep(per_piece)
+            delta = piece if n == 0 else " " + piece
+            self._sse("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                              "delta": {"type": "text_delta", "text": delta}})
+        self._sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+        self._sse("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn"},
+                                    "usage": {"output_tokens": tokens}})
+        self._sse("message_stop", {"type": "message_stop"})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        self._json(200, {"requests": _request_count})
+
+
+class FakeClaude(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, opts):
+        super().__init__(address, Handler)
+        self.opts = opts
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=150)
+    parser.add_argument("--output-tokens", type=int, default=300, help="capped by the request's max_tokens")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--rate-529", type=float, default=0.0, help="fraction of requests answered 529")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    return parser
+
+
+def main() -> None:
+    opts = build_parser().parse_args()
+    server = FakeClaude((opts.host, opts.port), opts)
+    print(f"fake Messages API on http://{opts.host}:{opts.port}/v1/messages", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
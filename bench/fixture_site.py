@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Serve the saved pages in bench/pages as local websites for analyse_website.
+
+Every request path maps onto one of the corpus pages (``/dental-practice``
+→ ``dental-practice.html``, anything else round-robins), so load tests can
+use many distinct URLs without hitting the internet.
+
+    python bench/fixture_site.py --port 8102 --latency 0.05
+"""
+
+import argparse
+import itertools
+import pathlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGES_DIR = pathlib.Path(__file__).resolve().parent / "pages"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FixtureSite"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = self.server.page_for(self.path)
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("content-type", "text/html; charset=utf-8")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FixtureSite(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, pages_dir: pathlib.Path, latency: float):
+        super().__init__(address, Handler)
+        self.latency = latency
+        self.pages = {p.stem: p.read_bytes() for p in sorted(pages_dir.glob("*.htm*"))}
+        if not self.pages:
+            raise SystemExit(f"no .html files in {pages_dir}")
+        self._cycle = itertools.cycle(list(self.pages.values()))
+        self._lock = threading.Lock()
+
+    def page_for(self, path: str) -> bytes:
+        name = path.strip("/").split("?")[0].split("/")[0]
+        if name in self.pages:
+            return self.pages[name]
+        with self._lock:
+            return next(self._cycle)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8102)
+    parser.add_argument("--pages", type=pathlib.Path, default=PAGES_DIR)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    args = parser.parse_args()
+
+    server = FixtureSite((args.host, args.port), args.pages, args.latency)
+    print(f"fixture site on http://{args.host}:{args.port}/ ({', '.join(server.pages)})", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Load test: drive the /api endpoints under gunicorn against local stand-ins.
+
+Starts ``fake_claude.py``, ``fixture_site.py`` and gunicorn (pointed at the
+fake via ``CLAUDE_API_URL``, with a throwaway state directory), then runs
+each endpoint in turn at the requested concurrency and reports throughput
+and p50/p95/p99 latency. Nothing leaves the machine.
+
+    python bench/load_bench.py                           # defaults
+    python bench/load_bench.py -c 32 -n 200 -w 4 --rate-429 0.05
+    python bench/load_bench.py --target http://127.0.0.1:8000   # already running app
+"""
+
+import argparse
+import contextlib
+import itertools
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = pathlib.Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+ENDPOINTS = ("analyse-website", "upload-file", "generate-audit")
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return float("nan")
+    rank = max(1, round(pct / 100 * len(samples)))
+    return samples[min(rank, len(samples)) - 1]
+
+
+def wait_for_port(port: int, timeout: float = 20) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), timeout=0.5):
+            return
+        time.sleep(0.1)
+    raise SystemExit(f"nothing listening on port {port} after {timeout:.0f}s")
+
+
+def start(cmd: list[str], port: int, env: dict | None = None, log=None) -> subprocess.Popen:
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log or subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    wait_for_port(port)
+    return proc
+
+
+# ────────── request builders ─────────────────────────────────────────────────
+
+def make_calls(target: str, site: str, file_id: str, audit_mode: str):
+    """One callable per endpoint: ``call(session, n) -> status code``."""
+    payload = b"Policy schedule\nPublic liability: 1,000,000\nEmployers liability: 5,000,000\n" * 40
+
+    def analyse(session, n):
+        # Distinct URLs so every request reaches Claude rather than a cache.
+        return session.post(f"{target}/api/analyse-website", json={"website": f"{site}/page-{n}"}).status_code
+
+    def upload(session, n):
+        files = {"file": (f"schedule-{n}.txt", payload + str(n).encode(), "text/plain")}
+        return session.post(f"{target}/api/upload-file", files=files).status_code
+
+    def audit(session, n):
+        body = {"website": f"{site}/audit-{n}", "files": [file_id], "mode": audit_mode}
+        return session.post(f"{target}/api/generate-audit", json=body).status_code
+
+    return {"analyse-website": analyse, "upload-file": upload, "generate-audit": audit}
+
+
+def run_endpoint(call, *, total: int, concurrency: int) -> dict:
+    local = threading.local()
+    counter = itertools.count()
+
+    def one(_):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        session = local.session
+        started = time.perf_counter()
+        try:
+            status = call(session, next(counter))
+        except requests.RequestException:
+            status = 0
+        return status, time.perf_counter() - started
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - began
+
+    ok = sorted(elapsed for status, elapsed in results if status == 200)
+    return {
+        "ok": len(ok),
+        "errors": total - len(ok),
+        "rps": len(ok) / wall if wall else 0.0,
+        "p50": percentile(ok, 50) * 1000,
+        "p95": percentile(ok, 95) * 1000,
+        "p99": percentile(ok, 99) * 1000,
+    }
+
+
+# ────────── main ─────────────────────────────────────────────────────────────
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("-n", "--requests", type=int, default=50, help="requests per endpoint")
+    parser.add_argument("-e", "--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--mode", default="html", help="audit mode for generate-audit")
+    parser.add_argument("--target", help="benchmark an app that is already running at this URL")
+    app = parser.add_argument_group("gunicorn")
+    app.add_argument("-w", "--workers", type=int, default=2)
+    app.add_argument("--threads", type=int, default=1)
+    app.add_argument("--worker-class", help="gunicorn -k (default: from the config file, else sync)")
+    app.add_argument("--config", default="gunicorn.conf.py", help="gunicorn config file, relative to the repo")
+    app.add_argument("--app", default="app:app", help="WSGI/ASGI application for gunicorn")
+    app.add_argument("--port", type=int, default=8100)
+    fake = parser.add_argument_group("fake Claude / fixture site")
+    fake.add_argument("--claude-port", type=int, default=8101)
+    fake.add_argument("--site-port", type=int, default=8102)
+    fake.add_argument("--latency", type=float, default=0.5, help="fake Claude time to first token")
+    fake.add_argument("--tokens-per-sec", type=float, default=150)
+    fake.add_argument("--output-tokens", type=int, default=300)
+    fake.add_argument("--rate-429", type=float, default=0.0)
+    fake.add_argument("--rate-529", type=float, default=0.0)
+    fake.add_argument("--site-latency", type=float, default=0.05)
+    return parser
+
+
+def run(args) -> dict[str, dict]:
+    """Start the stand-ins (and gunicorn unless ``--target``); return results per endpoint."""
+    procs = []
+    state = tempfile.TemporaryDirectory(prefix="joro-bench-")
+    log = open(pathlib.Path(state.name) / "gunicorn.log", "wb")
+    try:
+        procs.append(start([
+            sys.executable, str(BENCH_DIR / "fake_claude.py"), "--port", str(args.claude_port),
+            "--latency", str(args.latency), "--tokens-per-sec", str(args.tokens_per_sec),
+            "--output-tokens", str(args.output_tokens),
+            "--rate-429", str(args.rate_429), "--rate-529", str(args.rate_529), "--retry-after", "0.2",
+        ], args.claude_port))
+        procs.append(start([
+            sys.executable, str(BENCH_DIR / "fixture_site.py"), "--port", str(args.site_port),
+            "--latency", str(args.site_latency),
+        ], args.site_port))
+
+        target = args.target
+        if target is None:
+            metrics_dir = pathlib.Path(state.name) / "prometheus"
+            metrics_dir.mkdir()
+            env = {
+                **os.environ,
+                "ANTHROPIC_API_KEY": os.getenv("ANTHROPIC_API_KEY", "bench"),
+                "CLAUDE_API_URL": f"http://127.0.0.1:{args.claude_port}/v1/messages",
+                "JORO_STATE_DIR": str(pathlib.Path(state.name) / "state"),
+                "TMPDIR": state.name,  # uploads.UPLOAD_DIR lives under tempfile.gettempdir()
+                "PROMETHEUS_MULTIPROC_DIR": str(metrics_dir),
+                "LLM_CACHE": "0",
+                "CLAUDE_RPM": "0",  # measure the app, not our own throttle
+                "CLAUDE_TPM": "0",
+                "SLOW_REQUEST_SECONDS": "3600",
+            }
+            cmd = [
+                sys.executable, "-m", "gunicorn", args.app, "-c", args.config,
+                "-b", f"127.0.0.1:{args.port}", "-w", str(args.workers), "--threads", str(args.threads),
+                "--timeout", "300",
+            ]
+            if args.worker_class:
+                cmd += ["-k", args.worker_class]
+            procs.append(start(cmd, args.port, env=env, log=log))
+            target = f"http://127.0.0.1:{args.port}"
+
+        site = f"http://127.0.0.1:{args.site_port}"
+        seed = requests.post(f"{target}/api/upload-file", files={"file": ("seed.txt", b"Policy schedule seed")})
+        seed.raise_for_status()
+        calls = make_calls(target, site, seed.json()["id"], args.mode)
+
+        return {
+            name: run_endpoint(calls[name], total=args.requests, concurrency=args.concurrency)
+            for name in args.endpoints
+        }
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                proc.wait(timeout=10)
+        log.close()
+        state.cleanup()
+
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    results = run(args)
+    print(f"{args.app} via {args.config} | workers={args.workers} threads={args.threads} "
+          f"| concurrency={args.concurrency} requests={args.requests}")
+    print(f"{'endpoint':18} {'ok':>5} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in results.items():
+        print(f"{name:18} {r['ok']:5d} {r['errors']:5d} {r['rps']:8.1f} "
+              f"{r['p50']:9.0f} {r['p95']:9.0f} {r['p99']:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
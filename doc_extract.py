@@ -0,0 +1,213 @@
+# doc_extract.py - Background text extraction for uploaded documents
+"""
+``submit`` hands a freshly stored upload to a worker pool as soon as
+``/api/upload-file`` returns. Results are cached in SQLite by content hash,
+so a policy schedule uploaded by several brokers is parsed once and every
+gunicorn worker can read the text.
+
+``collect`` is what ``build_audit_prompt`` calls: it returns whatever
+extracts are ready, waits for in-flight ones only up to a shared deadline,
+and trims each document to a token budget.
+"""
+
+import os
+import pathlib
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import metrics
+import prompt_budget
+import storage
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+POOL_KIND = os.getenv("EXTRACT_POOL", "thread")  # "thread" or "process"
+WORKERS = int(os.getenv("EXTRACT_WORKERS", "2"))
+DOC_TOKENS = int(os.getenv("EXTRACT_DOC_TOKENS", "1500"))
+DEADLINE = float(os.getenv("EXTRACT_DEADLINE", "3"))
+STALE_AFTER = 300  # seconds before another worker may retry a pending job
+POLL_INTERVAL = 0.1  # waiting on an extraction running in another process
+
+TEXT_SUFFIXES = {".txt", ".md", ".csv", ".json", ".xml", ".html", ".htm"}
+
+_DB = "extracts.db"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extracts (
+    sha256     TEXT PRIMARY KEY,
+    status     TEXT NOT NULL,
+    text       TEXT,
+    error      TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def _db():
+    return storage.connect(_DB, _SCHEMA)
+
+
+# ────────── extractors (run inside the pool) ─────────────────────────────────
+
+def _pdf_text(path: str) -> str:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def _docx_text(path: str) -> str:
+    import docx
+
+    document = docx.Document(path)
+    return "\n".join(p.text for p in document.paragraphs if p.text)
+
+
+def _sniff(path: str, filename: str) -> str:
+    suffix = pathlib.Path(filename).suffix.lower()
+    with open(path, "rb") as fh:
+        head = fh.read(8)
+    if head.startswith(b"%PDF") or suffix == ".pdf":
+        return "pdf"
+    if suffix == ".docx":
+        return "docx"
+    if suffix in TEXT_SUFFIXES:
+        return "text"
+    return "unsupported"
+
+
+def extract_file(path: str, filename: str) -> tuple[str, str]:
+    """Return (status, text) for one file; module-level so it pickles."""
+    kind = _sniff(path, filename)
+    if kind == "pdf":
+        return "done", _pdf_text(path)
+    if kind == "docx":
+        return "done", _docx_text(path)
+    if kind == "text":
+        return "done", pathlib.Path(path).read_text(encoding="utf-8", errors="replace")
+    return "unsupported", ""
+
+
+# ────────── pool management ──────────────────────────────────────────────────
+
+_pool = None
+_pool_pid: int | None = None
+_futures: dict[str, Future] = {}
+_lock = threading.RLock()  # _finish may run inline from add_done_callback
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        executor = ProcessPoolExecutor if POOL_KIND == "process" else ThreadPoolExecutor
+        _pool, _pool_pid = executor(max_workers=WORKERS), os.getpid()
+        _futures.clear()
+    return _pool
+
+
+def _finish(sha256: str, started: float, future: Future) -> None:
+    try:
+        status, text = future.result()
+        error = None
+    except Exception as exc:
+        status, text, error = "failed", None, str(exc)
+
+    _db().execute(
+        "UPDATE extracts SET status = ?, text = ?, error = ?, updated_at = ? WHERE sha256 = ?",
+        (status, text, error, time.time(), sha256),
+    )
+    elapsed = time.monotonic() - started
+    metrics.incr(f"extracts_{status}")
+    metrics.incr("extract_seconds_total", elapsed)
+    print(f"[Extract] {sha256[:12]} {status} in {elapsed:.2f}s | {len(text or '')} chars")
+    with _lock:
+        _futures.pop(sha256, None)
+
+
+def submit(entry: dict) -> None:
+    """Queue extraction for an upload unless its hash is already handled."""
+    sha256 = entry["sha256"]
+    claimed = _db().execute(
+        "INSERT OR IGNORE INTO extracts (sha256, status, updated_at) VALUES (?, 'pending', ?)",
+        (sha256, time.time()),
+    ).rowcount
+    if not claimed:
+        metrics.incr("extracts_reused")
+        return
+    _start(sha256, entry["path"], entry["filename"])
+
+
+def _start(sha256: str, path: str, filename: str) -> Future:
+    with _lock:
+        future = _futures.get(sha256)
+        if future is None:
+            future = _get_pool().submit(extract_file, path, filename)
+            _futures[sha256] = future
+            started = time.monotonic()
+            future.add_done_callback(lambda f: _finish(sha256, started, f))
+    return future
+
+
+# ────────── prompt-side access ───────────────────────────────────────────────
+
+def _trim(text: str, max_tokens: int) -> str:
+    return prompt_budget.truncate(" ".join(text.split()), max_tokens, suffix=" …[truncated]")
+
+
+def _reclaim_stale(entry: dict) -> None:
+    """Restart a job another (possibly dead) worker left pending too long."""
+    cur = _db().execute(
+        "UPDATE extracts SET updated_at = ? WHERE sha256 = ? AND status = 'pending' AND updated_at < ?",
+        (time.time(), entry["sha256"], time.time() - STALE_AFTER),
+    )
+    if cur.rowcount:
+        _start(entry["sha256"], entry["path"], entry["filename"])
+
+
+def _poll(conn, sha256: str, until: float) -> tuple[str, str | None]:
+    """Wait for another worker's extraction by watching its row until ``until``."""
+    while True:
+        row = conn.execute("SELECT status, text FROM extracts WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is not None and row["status"] != "pending":
+            return row["status"], row["text"]
+        if time.monotonic() >= until:
+            metrics.incr("extracts_deadline_missed")
+            return "pending", None
+        time.sleep(min(POLL_INTERVAL, max(until - time.monotonic(), 0)))
+
+
+def collect(entries: list[dict], *, deadline: float = DEADLINE, max_tokens: int = DOC_TOKENS) -> list[dict]:
+    """Extracted text for each upload, waiting at most ``deadline`` seconds in total.
+
+    Each result is ``{"filename", "status", "text"}``; documents that are
+    still being parsed when the deadline passes come back as ``pending``.
+    """
+    until = time.monotonic() + deadline
+    conn = _db()
+    results = []
+    for entry in entries:
+        sha256 = entry["sha256"]
+        row = conn.execute("SELECT status, text FROM extracts WHERE sha256 = ?", (sha256,)).fetchone()
+        status, text = (row["status"], row["text"]) if row else ("pending", None)
+
+        if status == "pending":
+            if row is None:
+                submit(entry)  # uploaded before extraction existed
+            else:
+                _reclaim_stale(entry)
+            with _lock:
+                future = _futures.get(sha256)
+            if future is not None:
+                try:
+                    status, text = future.result(timeout=max(until - time.monotonic(), 0))
+                except FutureTimeout:
+                    metrics.incr("extracts_deadline_missed")
+                except Exception:
+                    status = "failed"
+            else:
+                status, text = _poll(conn, sha256, until)
+
+        text = _trim(text or "", max_tokens) if status == "done" else ""
+        results.append({"filename": entry["filename"], "status": status, "text": text})
+    return results
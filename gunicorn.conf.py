@@ -0,0 +1,27 @@
+# gunicorn.conf.py - Settings picked up automatically by `gunicorn app:app`
+"""
+Only hooks live here for now; bind, workers and timeouts still come from the
+command line or ``GUNICORN_CMD_ARGS``.
+
+With ``PROMETHEUS_MULTIPROC_DIR`` set, each worker writes its metrics to
+files in that directory; ``child_exit`` marks a dead worker's gauges so
+``/metrics`` stops reporting them. ``post_worker_init`` starts each
+worker's audit job runners, so queued jobs resume without waiting for a
+request.
+"""
+
+import os
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    import audit_jobs
+    from app import _run_audit
+
+    audit_jobs.start(_run_audit)
@@ -0,0 +1,39 @@
+# gunicorn_async.conf.py - Settings for the async app: gunicorn -c gunicorn_async.conf.py asgi:app
+"""
+Few processes, many connections each: every worker runs one event loop and
+holds up to ``ASYNC_LIMIT_CONCURRENCY`` requests, nearly all of them parked
+on Claude. Add workers for CPU (roughly one per core), not for concurrency.
+"""
+
+import multiprocessing
+import os
+
+from uvicorn_worker import UvicornWorker
+
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        "limit_concurrency": int(os.getenv("ASYNC_LIMIT_CONCURRENCY", "1000")),  # 503 beyond this
+        "timeout_keep_alive": 5,
+    }
+
+
+worker_class = Worker
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count(), 4))))
+bind = os.getenv("BIND", "0.0.0.0:8000")
+backlog = 2048
+keepalive = 5
+# Only trips if the event loop itself is blocked; audits are awaited, not run here.
+timeout = 120
+graceful_timeout = 60
+# Recycle workers now and then to cap slow leaks, staggered so they don't restart together.
+max_requests = 10000
+max_requests_jitter = 1000
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,128 @@
+# http_client.py - Process-wide pooled HTTP sessions for outbound calls
+"""
+One keep-alive ``requests.Session`` per worker process, shared by the Claude
+client and the website fetcher so repeat calls skip DNS / TCP / TLS setup.
+
+Sessions are created lazily and keyed on the PID, so gunicorn workers forked
+from a preloaded master never share sockets with their parent.
+"""
+
+import os
+import socket
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))  # hosts kept
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))  # sockets per host
+KEEPALIVE = os.getenv("HTTP_KEEPALIVE", "1") != "0"
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+LOG_EVERY = int(os.getenv("HTTP_REUSE_LOG_EVERY", "20"))
+
+# ────────── connection accounting ────────────────────────────────────────────
+
+_lock = threading.Lock()
+_stats = {"requests": 0, "new_connections": 0}
+
+
+def _count(key: str) -> None:
+    with _lock:
+        _stats[key] += 1
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count("new_connections")
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count("new_connections")
+        return super()._new_conn()
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools count fresh sockets and enable TCP keep-alive."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        if KEEPALIVE:
+            kwargs["socket_options"] = [
+                (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+# ────────── session management ───────────────────────────────────────────────
+
+_session: requests.Session | None = None
+_session_pid: int | None = None
+
+
+def get_session() -> requests.Session:
+    """Return this process's shared session, creating it after a fork."""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = _PooledAdapter(
+                    pool_connections=POOL_CONNECTIONS,
+                    pool_maxsize=POOL_MAXSIZE,
+                    pool_block=False,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                if not KEEPALIVE:
+                    session.headers["Connection"] = "close"
+                _session, _session_pid = session, pid
+                _stats.update(requests=0, new_connections=0)
+    return _session
+
+
+def reuse_stats() -> dict:
+    """Snapshot of request / new-connection counts and the reuse ratio."""
+    with _lock:
+        total, fresh = _stats["requests"], _stats["new_connections"]
+    reused = max(total - fresh, 0)
+    return {
+        "requests": total,
+        "new_connections": fresh,
+        "reuse_rate": round(reused / total, 3) if total else 0.0,
+    }
+
+
+def request(method: str, url: str, *, timeout=None, **kwargs) -> requests.Response:
+    """Send a request through the pooled session with default timeouts."""
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    resp = get_session().request(method, url, timeout=timeout, **kwargs)
+    _count("requests")
+
+    total = _stats["requests"]
+    if LOG_EVERY and total % LOG_EVERY == 0:
+        s = reuse_stats()
+        print(
+            f"[HTTP] pid {os.getpid()} | {s['requests']} requests | "
+            f"{s['new_connections']} new connections | reuse {s['reuse_rate']:.0%}"
+        )
+    return resp
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
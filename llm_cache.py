@@ -0,0 +1,140 @@
+# llm_cache.py - Content-addressed cache for Claude completions
+"""
+Two-level cache keyed by a hash of (model, prompt, temperature, max_tokens):
+
+* an in-memory LRU per worker process for the hottest entries
+* a SQLite store in ``storage.STATE_DIR`` shared by all gunicorn workers
+
+Entries expire after ``LLM_CACHE_TTL`` seconds and the on-disk store is
+trimmed least-recently-used first once it grows past ``LLM_CACHE_DISK_MB``.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+import storage
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+TTL = int(os.getenv("LLM_CACHE_TTL", "3600"))
+MEMORY_ITEMS = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "128"))
+DISK_MAX_BYTES = int(float(os.getenv("LLM_CACHE_DISK_MB", "200")) * 1024 * 1024)
+
+_DB = "llm_cache.db"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key        TEXT PRIMARY KEY,
+    value      TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+_memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def make_key(model: str, prompt, temperature: float, max_tokens: int) -> str:
+    """Stable SHA-256 over the inputs that determine a completion."""
+    raw = json.dumps([model, prompt, temperature, max_tokens], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, created_at: float, value: str) -> None:
+    with _lock:
+        _memory[key] = (created_at, value)
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_ITEMS:
+            _memory.popitem(last=False)
+
+
+def get(key: str) -> str | None:
+    """Return a cached completion, or None on a miss / expired entry."""
+    if not ENABLED:
+        return None
+    now = time.time()
+
+    with _lock:
+        hit = _memory.get(key)
+        if hit is not None:
+            if now - hit[0] < TTL:
+                _memory.move_to_end(key)
+                metrics.incr("llm_cache_hits")
+                metrics.incr("llm_cache_memory_hits")
+                return hit[1]
+            del _memory[key]
+
+    conn = storage.connect(_DB, _SCHEMA)
+    row = conn.execute(
+        "SELECT value, created_at FROM responses WHERE key = ? AND created_at > ?",
+        (key, now - TTL),
+    ).fetchone()
+    if row is None:
+        metrics.incr("llm_cache_misses")
+        return None
+
+    conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+    _remember(key, row["created_at"], row["value"])
+    metrics.incr("llm_cache_hits")
+    metrics.incr("llm_cache_disk_hits")
+    return row["value"]
+
+
+def put(key: str, value: str) -> None:
+    """Store a completion in both tiers and trim the disk store if needed."""
+    if not ENABLED:
+        return
+    now = time.time()
+    _remember(key, now, value)
+
+    conn = storage.connect(_DB, _SCHEMA)
+    conn.execute(
+        "INSERT OR REPLACE INTO responses (key, value, size, created_at, last_used) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (key, value, len(value.encode("utf-8")), now, now),
+    )
+    metrics.incr("llm_cache_writes")
+    _evict(conn, now)
+
+
+def _evict(conn, now: float) -> None:
+    expired = conn.execute("DELETE FROM responses WHERE created_at <= ?", (now - TTL,)).rowcount
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    trimmed = 0
+    while total > DISK_MAX_BYTES:
+        rows = conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_used LIMIT 50"
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            conn.execute("DELETE FROM responses WHERE key = ?", (row["key"],))
+            total -= row["size"]
+            trimmed += 1
+            if total <= DISK_MAX_BYTES:
+                break
+
+    if expired or trimmed:
+        metrics.incr("llm_cache_evictions", expired + trimmed)
+
+
+def stats() -> dict:
+    """Entry count and size of the shared store plus this worker's LRU size."""
+    if not ENABLED:
+        return {"enabled": False}
+    conn = storage.connect(_DB, _SCHEMA)
+    count, size = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+    ).fetchone()
+    with _lock:
+        memory_items = len(_memory)
+    return {"enabled": True, "entries": count, "bytes": size, "memory_entries": memory_items}
@@ -0,0 +1,199 @@
+# metrics.py - Counters, timing spans and the Prometheus exposition
+"""
+Modules call ``incr("llm_cache_hits")``; ``/api/stats`` reports the
+per-process ``snapshot()`` and ``/metrics`` exports the same counters, plus
+request, stage and Claude latency histograms, in Prometheus format.
+
+Each API request gets a ``RequestTimer`` (see ``start_request``). Code on
+the request path wraps its stages in ``span("fetch")`` etc.; outside a
+request (job runners, section threads) spans only feed the histograms.
+Background work that wants its own tally (speculative audits, portfolio
+sites) uses ``start_background``, which records into
+``joro_background_seconds`` so it stays out of API latency.
+Requests slower than ``SLOW_REQUEST_SECONDS`` are logged as one JSON line.
+
+Under gunicorn set ``PROMETHEUS_MULTIPROC_DIR`` to an empty, writable
+directory before the workers start; ``/metrics`` then aggregates every
+worker (``gunicorn.conf.py`` cleans up after exited workers).
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+import prometheus_client as prom
+from prometheus_client import multiprocess
+
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "10"))
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+EVENTS = prom.Counter("joro_events_total", "Subsystem event counters (see incr())", ["name"])
+REQUEST_SECONDS = prom.Histogram(
+    "joro_request_seconds", "API request latency", ["route", "status"], buckets=LATENCY_BUCKETS
+)
+BACKGROUND_SECONDS = prom.Histogram(
+    "joro_background_seconds", "Latency of background work (speculative audits, portfolio sites)",
+    ["task", "status"], buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = prom.Histogram(
+    "joro_stage_seconds", "Latency of one stage within a request", ["route", "stage"], buckets=LATENCY_BUCKETS
+)
+CLAUDE_SECONDS = prom.Histogram(
+    "joro_claude_request_seconds", "Claude Messages API call latency", ["outcome"], buckets=LATENCY_BUCKETS
+)
+CLAUDE_TOKENS = prom.Counter("joro_claude_tokens_total", "Tokens reported in Claude usage", ["kind"])
+
+_lock = threading.Lock()
+_counters: Counter = Counter()
+
+
+def incr(name: str, amount: float = 1) -> None:
+    with _lock:
+        _counters[name] += amount
+    EVENTS.labels(name).inc(amount)
+
+
+def snapshot() -> dict:
+    with _lock:
+        return dict(_counters)
+
+
+# ────────── request timing ───────────────────────────────────────────────────
+
+class RequestTimer:
+    """Stage durations and token usage for one API request."""
+
+    def __init__(self, route: str, histogram=REQUEST_SECONDS):
+        self.route = route
+        self.histogram = histogram
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.tokens: Counter = Counter()
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def finish(self, status: int) -> float:
+        elapsed = time.perf_counter() - self.started
+        self.histogram.labels(self.route, str(status)).observe(elapsed)
+        if elapsed >= SLOW_REQUEST_SECONDS:
+            print(json.dumps({
+                "event": "slow_request" if self.histogram is REQUEST_SECONDS else "slow_background",
+                "route": self.route,
+                "status": status,
+                "total_ms": round(elapsed * 1000),
+                "stages_ms": {stage: round(s * 1000) for stage, s in self.stages.items()},
+                "tokens": dict(self.tokens),
+            }))
+        return elapsed
+
+
+_current: contextvars.ContextVar[RequestTimer | None] = contextvars.ContextVar("request_timer", default=None)
+
+
+def start_request(route: str) -> RequestTimer:
+    timer = RequestTimer(route)
+    _current.set(timer)
+    return timer
+
+
+def start_background(task: str) -> RequestTimer:
+    """``start_request`` for work no API caller is waiting on; recorded in ``joro_background_seconds``."""
+    timer = RequestTimer(task, BACKGROUND_SECONDS)
+    _current.set(timer)
+    return timer
+
+
+def finish_request(status: int) -> None:
+    timer = _current.get()
+    if timer is not None:
+        _current.set(None)
+        timer.finish(status)
+
+
+def stream_request(body, status: int):
+    """Hand the current request's timer to a streamed ``body``.
+
+    The timer is current while ``body`` produces each chunk and finishes
+    when it is exhausted or closed, so streamed routes record their full
+    duration, stages and tokens rather than just the time to the headers.
+    """
+    timer = _current.get()
+    if timer is None:
+        return body
+    _current.set(None)
+    return _carry(timer, body, status)
+
+
+def _carry(timer: RequestTimer, body, status: int):
+    chunks = iter(body)
+    try:
+        while True:
+            token = _current.set(timer)
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                _current.reset(token)
+            yield chunk
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+        timer.finish(status)
+
+
+@contextlib.contextmanager
+def span(stage: str):
+    """Time a block as ``stage`` of the current request (or of "background")."""
+    timer = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(timer.route if timer else "background", stage).observe(elapsed)
+        if timer is not None:
+            timer.add_stage(stage, elapsed)
+
+
+@contextlib.contextmanager
+def claude_call():
+    """``span("claude")`` that also feeds the Claude latency histogram."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with span("claude"):
+            yield
+        outcome = "ok"
+    finally:
+        CLAUDE_SECONDS.labels(outcome).observe(time.perf_counter() - started)
+
+
+def record_usage(counts: dict[str, int]) -> None:
+    """Token counts from a Claude ``usage`` block (input, output, cache_*)."""
+    timer = _current.get()
+    with _lock:
+        for kind, value in counts.items():
+            _counters[f"claude_{kind}_tokens"] += value
+    for kind, value in counts.items():
+        CLAUDE_TOKENS.labels(kind).inc(value)
+        if timer is not None:
+            timer.tokens[kind] += value
+
+
+# ────────── exposition ───────────────────────────────────────────────────────
+
+def exposition() -> tuple[bytes, str]:
+    """Body and content type for ``/metrics``, aggregated across workers if configured."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = prom.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prom.REGISTRY
+    return prom.generate_latest(registry), prom.CONTENT_TYPE_LATEST
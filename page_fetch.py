@@ -0,0 +1,267 @@
+# page_fetch.py - Bounded website fetch and early-terminating text extraction
+"""
+``fetch_page_text`` streams a page through the pooled session, refuses
+non-HTML content, stops reading at ``PAGE_MAX_BYTES`` and feeds the body
+into ``TextExtractor`` chunk by chunk. The extractor drops script/style/nav
+boilerplate and stops as soon as it has ``max_chars`` of visible text, so
+the rest of a heavy page is never downloaded or parsed. Alongside the flat
+text it records typed blocks (title, meta description, headings, other
+text) for ``prompt_budget.assemble`` to rank. The body is decoded with the
+Content-Type charset, else the page's ``<meta charset>``, else the detected
+encoding.
+"""
+
+import codecs
+import os
+import re
+from html.parser import HTMLParser
+
+from requests.compat import chardet
+
+import http_client
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+MAX_PAGE_BYTES = int(os.getenv("PAGE_MAX_BYTES", str(2 * 1024 * 1024)))
+CHUNK_SIZE = int(os.getenv("PAGE_CHUNK_SIZE", "16384"))
+FETCH_TIMEOUT = float(os.getenv("PAGE_FETCH_TIMEOUT", "20"))
+# Visible text read for ranking; prompt_budget decides how much is sent.
+SCAN_CHARS = int(os.getenv("PAGE_SCAN_CHARS", "16000"))
+# Without a charset in Content-Type, this much of the body is held back to
+# find <meta charset> or, failing that, to detect the encoding.
+SNIFF_BYTES = 8192
+
+ALLOWED_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64)"
+
+# Elements whose text is never business content.
+SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas",
+    "nav", "footer", "iframe", "form", "select", "button",
+}
+# A whole id / class token naming a cookie banner or consent overlay
+# ("cookie-banner", "onetrust-consent-sdk", "CybotCookiebotDialog") — not
+# state classes such as "cookies-not-set" that plugins put on <body>.
+SKIP_MARKER = re.compile(
+    r"(?:[a-z]+[-_]?)?(?:cookies?|cookiebot|consent|gdpr)"
+    r"(?:[-_]?(?:banner|bar|notice|notification|popup|modal|overlay|dialog|box|container|wrapper|message|law|info|sdk))*",
+    re.I,
+)
+# Page-level containers are never skipped, whatever their classes say.
+NEVER_SKIP = {"html", "body", "main"}
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+HEADING_KINDS = {"h1": "h1", "h2": "h2", "h3": "h3", "h4": "h3", "h5": "h3", "h6": "h3"}
+# Elements that start a new block of text.
+BLOCK_TAGS = {
+    "title", "p", "div", "section", "article", "header", "main", "aside",
+    "ul", "ol", "li", "dl", "dt", "dd", "table", "tr", "td", "th", "blockquote",
+    *HEADING_KINDS,
+}
+DESCRIPTION_META = ("description", "og:description")
+
+_WS = re.compile(r"\s+")
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.I)
+
+
+class FetchError(Exception):
+    """The page could not be fetched or is not something we can read."""
+
+
+class TextExtractor(HTMLParser):
+    """Incremental visible-text extractor with a character budget."""
+
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts: list[str] = []
+        self.blocks: list[tuple[str, str]] = []  # (kind, text), kind in prompt_budget.KIND_SCORES
+        self.length = 0
+        self.done = False
+        self._open: dict[str, int] = {}
+        self._skip_until: tuple[str, int] | None = None
+        self._block: list[str] = []
+        self._kind = "text"
+        self._has_description = False
+
+    def _flush(self, kind: str = "text") -> None:
+        if self._block:
+            self.blocks.append((self._kind, " ".join(self._block)))
+            self._block = []
+        self._kind = kind
+
+    def _meta(self, attrs) -> None:
+        attrs = dict(attrs)
+        name = (attrs.get("name") or attrs.get("property") or "").lower()
+        content = _WS.sub(" ", attrs.get("content") or "").strip()
+        if name in DESCRIPTION_META and content and not self._has_description:
+            self.blocks.append(("description", content))
+            self._has_description = True
+
+    def _should_skip(self, tag: str, attrs) -> bool:
+        if tag in SKIP_TAGS:
+            return True
+        if tag in NEVER_SKIP:
+            return False
+        for name, value in attrs:
+            if name in ("id", "class") and value:
+                if any(SKIP_MARKER.fullmatch(token) for token in value.split()):
+                    return True
+        return False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "meta":
+            self._meta(attrs)
+        if tag in VOID_TAGS:
+            return
+        if tag in BLOCK_TAGS:
+            self._flush("title" if tag == "title" else HEADING_KINDS.get(tag, "text"))
+        depth = self._open.get(tag, 0) + 1
+        self._open[tag] = depth
+        if self._skip_until is None and self._should_skip(tag, attrs):
+            self._skip_until = (tag, depth)
+
+    def handle_endtag(self, tag):
+        depth = self._open.get(tag, 0)
+        if not depth:
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+        if self._skip_until and self._skip_until[0] == tag and depth <= self._skip_until[1]:
+            self._skip_until = None
+        self._open[tag] = depth - 1
+
+    def handle_data(self, data):
+        if self.done or self._skip_until:
+            return
+        text = _WS.sub(" ", data).strip()
+        if not text:
+            return
+        room = self.max_chars - self.length - (1 if self.parts else 0)
+        if len(text) >= room:
+            text = text[: max(room, 0)]
+            self.done = True
+        if text:
+            self.parts.append(text)
+            self._block.append(text)
+            self.length += len(text) + (1 if len(self.parts) > 1 else 0)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def text(self) -> str:
+        return " ".join(self.parts)
+
+
+def extract_text(html: str, max_chars: int = 4000) -> str:
+    """Extract up to ``max_chars`` of visible text from an HTML string."""
+    parser = TextExtractor(max_chars)
+    for start in range(0, len(html), CHUNK_SIZE):
+        parser.feed(html[start : start + CHUNK_SIZE])
+        if parser.done:
+            break
+    return parser.text()
+
+
+def _codec(label) -> str | None:
+    try:
+        return codecs.lookup(label).name if label else None
+    except LookupError:
+        return None
+
+
+def _charset(content_type: str) -> str | None:
+    """The charset declared in a Content-Type header, if Python knows it."""
+    match = re.search(r"charset=([\w-]+)", content_type, re.I)
+    return _codec(match.group(1)) if match else None
+
+
+def _sniff_charset(head: bytes) -> str:
+    """``<meta charset>`` / ``http-equiv`` in the first bytes, else detection as in ``resp.apparent_encoding``."""
+    match = _META_CHARSET.search(head)
+    declared = _codec(match.group(1).decode("ascii", "ignore")) if match else None
+    if declared and not declared.startswith("utf-16"):  # bytes already read as ASCII-compatible
+        return declared
+    return _codec(chardet.detect(head).get("encoding")) or "utf-8"
+
+
+REQUEST_HEADERS = {"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml"}
+
+
+class PageReader:
+    """Decode and parse a response body chunk by chunk, within the byte cap.
+
+    Shared by the blocking fetch below and the async one in ``asgi.py``.
+    """
+
+    def __init__(self, content_type: str, max_chars: int):
+        if not content_type.lower().startswith(ALLOWED_CONTENT_TYPES):
+            raise FetchError(f"unsupported content type: {content_type}")
+        self.content_type = content_type
+        charset = _charset(content_type)
+        self.decoder = codecs.getincrementaldecoder(charset)(errors="replace") if charset else None
+        self.head = b""  # body held back until the charset is known
+        self.parser = TextExtractor(max_chars)
+        self.received = 0
+        self.truncated = False
+
+    def feed(self, chunk: bytes) -> bool:
+        """Consume one chunk; True once there is no point reading further."""
+        room = MAX_PAGE_BYTES - self.received
+        if len(chunk) > room:
+            chunk, self.truncated = chunk[:room], True
+        self.received += len(chunk)
+        if not self.decoder:
+            self.head += chunk
+            if len(self.head) < SNIFF_BYTES and not self.truncated:
+                return False
+            chunk = self._start_decoding()
+        self.parser.feed(self.decoder.decode(chunk))
+        return self.parser.done or self.truncated
+
+    def _start_decoding(self) -> bytes:
+        charset = _sniff_charset(self.head)
+        self.decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+        chunk, self.head = self.head, b""
+        return chunk
+
+    def result(self, url: str, status: int, *, exhausted: bool) -> dict:
+        """Fetch metadata and text; ``exhausted`` means the body was read to the end."""
+        if not self.decoder:  # short page, still within the sniff window
+            head = self._start_decoding()
+            self.parser.feed(self.decoder.decode(head))
+        if exhausted:
+            self.parser.feed(self.decoder.decode(b"", final=True))
+        self.parser.close()
+        return {
+            "url": url,
+            "status": status,
+            "content_type": self.content_type,
+            "bytes_read": self.received,
+            "truncated": self.truncated,
+            "complete": not (self.parser.done or self.truncated),
+            "text": self.parser.text(),
+            "blocks": self.parser.blocks,
+        }
+
+
+def fetch_page_text(url: str, max_chars: int = 4000) -> dict:
+    """Fetch ``url`` and return its visible text plus fetch metadata.
+
+    Raises ``FetchError`` for unsupported content types; network and HTTP
+    errors propagate as ``requests.RequestException``.
+    """
+    timeout = (http_client.CONNECT_TIMEOUT, FETCH_TIMEOUT)
+
+    with http_client.get(url, headers=REQUEST_HEADERS, timeout=timeout, stream=True) as resp:
+        resp.raise_for_status()
+        reader = PageReader(resp.headers.get("Content-Type", "text/html"), max_chars)
+        exhausted = True
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            if reader.feed(chunk):
+                exhausted = False
+                break
+        return reader.result(resp.url, resp.status_code, exhausted=exhausted)
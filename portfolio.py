@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# portfolio.py - Bulk analyse + audit for a list of client websites
+"""
+Onboarding a broker means auditing hundreds of client sites. ``run`` takes
+the whole list and pushes each site through the same pipeline as the UI
+(fetch → analyse → no-documents audit):
+
+* at most ``PORTFOLIO_CONCURRENCY`` sites in flight, started no faster than
+  ``PORTFOLIO_RATE`` per minute; the Claude RPM/TPM buckets still apply
+* one entry per domain, so ``acme.co.uk`` and ``https://www.acme.co.uk/about``
+  are audited once and the second is reported as a duplicate
+* a site that fails is reported with the stage it failed at; the rest of
+  the portfolio carries on
+* finished sites are appended to an NDJSON checkpoint; running again with
+  the same checkpoint replays them and only does what is left. API
+  checkpoints are deleted once unused for ``PORTFOLIO_CHECKPOINT_TTL``
+
+``/api/portfolio`` streams the results as NDJSON; for very large lists run
+this module directly so no web worker is tied up:
+
+    python portfolio.py sites.csv --checkpoint acme-brokers.ndjson > results.ndjson
+"""
+
+import argparse
+import collections
+import contextvars
+import csv
+import json
+import os
+import pathlib
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import analysis_store
+import metrics
+import storage
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+CONCURRENCY = int(os.getenv("PORTFOLIO_CONCURRENCY", "4"))  # per run, and the ceiling for API callers
+RATE = float(os.getenv("PORTFOLIO_RATE", "30"))  # sites started per minute; 0 disables
+MAX_SITES = int(os.getenv("PORTFOLIO_MAX_SITES", "1000"))  # per API request
+CHECKPOINT_TTL = int(os.getenv("PORTFOLIO_CHECKPOINT_TTL", str(7 * 24 * 3600)))  # API runs, since last write
+
+RUN_DIR = storage.STATE_DIR / "portfolios"
+SITE_COLUMNS = ("website", "url", "domain", "site")
+
+_RUN_ID = re.compile(r"[\w-]{1,64}")
+
+
+# ────────── input ────────────────────────────────────────────────────────────
+
+def _with_scheme(website: str) -> str:
+    # Same default as the UI's website box.
+    return website if website.startswith(("http://", "https://")) else f"https://{website}"
+
+
+def parse_sites(text: str) -> list[str]:
+    """Websites from JSONL, CSV (a website/url/domain/site column, else the first) or one per line."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return []
+
+    if lines[0].lstrip().startswith("{"):
+        websites = []
+        for n, line in enumerate(lines, 1):
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                raise ValueError(f"line {n}: {exc}") from exc
+            websites.append(next((row[col] for col in SITE_COLUMNS if row.get(col)), ""))
+    else:
+        rows = list(csv.reader(lines))
+        header = [cell.strip().lower() for cell in rows[0]]
+        column = next((header.index(col) for col in SITE_COLUMNS if col in header), None)
+        if column is None:
+            column = 0
+        else:
+            rows = rows[1:]
+        websites = [row[column] for row in rows if len(row) > column]
+
+    return [_with_scheme(site.strip()) for site in websites if site and site.strip()]
+
+
+def request_sites(data: dict) -> list[str]:
+    """Websites from an API body: ``websites`` (a list) or ``sites`` (CSV/JSONL text)."""
+    if isinstance(data.get("websites"), list):
+        websites = [_with_scheme(str(site).strip()) for site in data["websites"] if str(site).strip()]
+    else:
+        websites = parse_sites(str(data.get("sites") or ""))
+    if not websites:
+        raise ValueError("no websites provided")
+    if len(websites) > MAX_SITES:
+        raise ValueError(f"{len(websites)} websites exceeds the limit of {MAX_SITES}; use portfolio.py")
+    return websites
+
+
+def request_limits(data: dict) -> tuple[int, float]:
+    """(concurrency, rate) from an API body; callers may ask for less than the server's budget, never more."""
+    concurrency, rate = data.get("concurrency"), data.get("rate")
+    try:
+        concurrency = CONCURRENCY if concurrency is None else int(concurrency)
+        rate = RATE if rate is None else float(rate)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("concurrency and rate must be numbers") from exc
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    if data.get("rate") is not None and not rate > 0:  # 0 or less would switch pacing off; also catches NaN
+        raise ValueError("rate must be greater than 0")
+    return min(concurrency, CONCURRENCY), min(rate, RATE) if RATE else rate
+
+
+def domain(website: str) -> str:
+    """Dedupe key: the host (and non-default port) without ``www.``."""
+    return re.split(r"[/?]", analysis_store.normalise_url(website), maxsplit=1)[0]
+
+
+def sweep_checkpoints(now: float | None = None) -> int:
+    """Delete API checkpoints not written to for ``CHECKPOINT_TTL`` seconds; returns how many."""
+    now = time.time() if now is None else now
+    removed = 0
+    for path in RUN_DIR.glob("*.ndjson"):
+        try:
+            if path.stat().st_mtime < now - CHECKPOINT_TTL:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:  # another worker swept it
+            pass
+    if removed:
+        metrics.incr("portfolio_checkpoints_expired", removed)
+    return removed
+
+
+def checkpoint_path(run_id: str | None) -> tuple[str, pathlib.Path]:
+    """(run_id, checkpoint file) for an API run; a fresh id when ``run_id`` is None.
+
+    Each call first sweeps expired checkpoints, so the directory stays bounded.
+    """
+    sweep_checkpoints()
+    if run_id is None:
+        run_id = uuid.uuid4().hex[:12]
+    elif not _RUN_ID.fullmatch(run_id):
+        raise ValueError("run_id may only contain letters, digits, '_' and '-'")
+    return run_id, RUN_DIR / f"{run_id}.ndjson"
+
+
+# ────────── checkpoint ───────────────────────────────────────────────────────
+
+class Checkpoint:
+    """Append-only NDJSON of finished sites; ``done`` holds the successful ones by domain."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self.done: dict[str, dict] = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        result = json.loads(line)
+                    except ValueError:  # torn final line from a killed run
+                        continue
+                    if result.get("status") == "ok":
+                        self.done[result["domain"]] = result
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def record(self, result: dict) -> None:
+        with self._lock:
+            self._fh.write(json.dumps(result) + "\n")
+            self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+# ────────── pipeline ─────────────────────────────────────────────────────────
+
+class _Pacer:
+    """Spaces site starts evenly at ``per_minute``."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60 / per_minute if per_minute > 0 else 0
+        self.next_start = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        time.sleep(start - now)
+
+
+def _process(website: str, key: str, analyse, audit, mode: str, use_cache: bool, pacer: _Pacer) -> dict:
+    pacer.wait()
+    timer = metrics.start_background("portfolio_site")
+    result = {"website": website, "domain": key}
+    stage = "analyse"
+    try:
+        analysis = analyse(website, use_cache=use_cache)
+        stage = "audit"
+        html = audit(website, [], mode=mode, use_cache=use_cache)
+        result.update(status="ok", summary=analysis["summary"], html=html)
+    except Exception as exc:  # one bad site must not sink the portfolio
+        result.update(status="error", stage=stage, error=str(exc) or type(exc).__name__)
+    elapsed = timer.finish(200 if result["status"] == "ok" else 500)
+    result["elapsed_ms"] = round(elapsed * 1000)
+    result["tokens"] = {"input": timer.tokens["input"], "output": timer.tokens["output"]}
+    return result
+
+
+def run(
+    websites: list[str],
+    *,
+    analyse,
+    audit,
+    mode: str = "html",
+    use_cache: bool = True,
+    concurrency: int = CONCURRENCY,
+    rate: float = RATE,
+    checkpoint: Checkpoint | None = None,
+):
+    """Yield one result dict per input website, as each finishes.
+
+    ``analyse`` and ``audit`` are ``app.analyse_site`` and
+    ``app.generate_audit_html`` (passed in to avoid a circular import).
+    Duplicates and checkpointed sites come first; a result's ``status`` is
+    ``ok``, ``error``, or ``duplicate``.
+    """
+    seen: dict[str, str] = {}
+    todo = []
+    for website in websites:
+        key = domain(website)
+        if key in seen:
+            yield {"website": website, "domain": key, "status": "duplicate", "of": seen[key]}
+        elif checkpoint is not None and key in checkpoint.done:
+            seen[key] = website
+            yield {**checkpoint.done[key], "resumed": True}
+        else:
+            seen[key] = website
+            todo.append((website, key))
+
+    pacer = _Pacer(rate)
+    pool = ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix="portfolio")
+    try:
+        # Fresh context per site: each gets its own RequestTimer for the token tally.
+        futures = [
+            pool.submit(contextvars.Context().run, _process, website, key, analyse, audit, mode, use_cache, pacer)
+            for website, key in todo
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            metrics.incr(f"portfolio_sites_{result['status']}")
+            if checkpoint is not None:
+                checkpoint.record(result)
+            yield result
+    finally:
+        # Client went away: drop the sites that have not started yet.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def stream(websites: list[str], *, run_id: str, checkpoint: pathlib.Path, **kwargs):
+    """``run`` as NDJSON lines, framed by a start line and a ``done`` line with counts."""
+    cp = Checkpoint(checkpoint)
+    try:
+        yield json.dumps({"run_id": run_id, "sites": len(websites), "checkpointed": len(cp.done)}) + "\n"
+        counts = collections.Counter()
+        for result in run(websites, checkpoint=cp, **kwargs):
+            counts[result["status"]] += 1
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"run_id": run_id, "done": True, **counts}) + "\n"
+    finally:
+        cp.close()
+
+
+# ────────── command line ─────────────────────────────────────────────────────
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analyse and audit every website in a CSV/JSONL file.")
+    parser.add_argument("sites", help="CSV, JSONL or one-per-line file; '-' for stdin")
+    parser.add_argument("--checkpoint", help="NDJSON checkpoint; rerun with the same file to resume "
+                                             "(default: <sites>.checkpoint.ndjson)")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=RATE, help="sites started per minute (0 = no limit)")
+    parser.add_argument("--mode", help="audit mode (default: AUDIT_MODE)")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the analysis and LLM caches")
+    args = parser.parse_args()
+
+    # Imported here so --help works without the app's configuration.
+    from app import AUDIT_MODE, AUDIT_MODES, analyse_site, generate_audit_html
+
+    text = sys.stdin.read() if args.sites == "-" else pathlib.Path(args.sites).read_text(encoding="utf-8-sig")
+    checkpoint = pathlib.Path(args.checkpoint or f"{'portfolio' if args.sites == '-' else args.sites}.checkpoint.ndjson")
+    mode = args.mode or AUDIT_MODE
+    if mode not in AUDIT_MODES:
+        parser.error(f"--mode must be one of {', '.join(AUDIT_MODES)}")
+
+    lines = stream(
+        parse_sites(text),
+        run_id=checkpoint.stem,
+        checkpoint=checkpoint,
+        analyse=analyse_site,
+        audit=generate_audit_html,
+        mode=mode,
+        use_cache=not args.no_cache,
+        concurrency=args.concurrency,
+        rate=args.rate,
+    )
+    out, sys.stdout = sys.stdout, sys.stderr  # the app logs with print(); keep stdout pure NDJSON
+    for line in lines:
+        out.write(line)
+        out.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# prompt_budget.py - Token estimates and budget-filling prompt assembly
+"""
+A page's first few thousand characters are mostly menus, banners and
+"Read more" links, and a fixed character slice says nothing about what a
+prompt will cost. This module:
+
+* estimates tokens locally (``estimate_tokens``) from word, number and
+  punctuation counts — a few regex scans, no tokenizer download. Estimates
+  run a little high on markup-heavy text; ``app._log_usage`` logs them
+  next to the real ``input_tokens`` so the drift stays visible.
+* ranks the blocks ``page_fetch`` extracts — title, meta description,
+  headings, then paragraphs weighted by how much they say about the
+  business — and keeps the best until ``budget`` tokens are used, emitted
+  in page order (``assemble``).
+
+``ANALYSIS_PAGE_TOKENS`` bounds the page text in the analyse-website
+prompt and ``AUDIT_SITE_TOKENS`` the website extract in each audit.
+"""
+
+import os
+import re
+
+import metrics
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+ANALYSIS_PAGE_TOKENS = int(os.getenv("ANALYSIS_PAGE_TOKENS", "700"))
+AUDIT_SITE_TOKENS = int(os.getenv("AUDIT_SITE_TOKENS", "500"))
+MIN_PARTIAL_TOKENS = 40  # don't bother cutting a paragraph down to less
+
+KIND_SCORES = {"title": 10.0, "description": 9.0, "h1": 8.0, "h2": 6.0, "h3": 5.0, "text": 1.0}
+LINE_PREFIXES = {"title": "Title: ", "description": "Description: ", "h1": "# ", "h2": "## ", "h3": "### ", "text": ""}
+
+# Words that tend to appear where a site describes what the business does.
+SIGNAL_WORDS = re.compile(
+    r"\b(?:we|our|about|services?|products?|customers?|clients?|employ\w*|staff|team|founded|"
+    r"established|since|family|specialis\w*|manufactur\w*|suppl\w*|install\w*|deliver\w*|"
+    r"premises|offices?|branch\w*|sites?|fleet|accredit\w*|certified|licensed|industr\w*|sectors?|"
+    r"export\w*|contracts?|projects?|commercial|residential)\b",
+    re.I,
+)
+BOILERPLATE = re.compile(
+    r"cookie|privacy|terms (?:and|&) conditions|all rights reserved|copyright|©|newsletter|subscribe|"
+    r"sign (?:in|up)|log ?in|follow us|share (?:on|this)|read more|click here|enable javascript",
+    re.I,
+)
+
+_WORDS = re.compile(r"[^\W\d_]+")
+_LONG_WORDS = re.compile(r"[^\W\d_]{7,}")
+_NUMBERS = re.compile(r"\d{1,3}")
+_PUNCT = re.compile(r"[^\w\s]|_")
+
+
+# ────────── estimation ───────────────────────────────────────────────────────
+
+def estimate_tokens(text: str) -> int:
+    """Approximate Claude token count: words (+1 for long ones), 3-digit groups, punctuation."""
+    return (
+        len(_WORDS.findall(text))
+        + len(_LONG_WORDS.findall(text))
+        + len(_NUMBERS.findall(text))
+        + len(_PUNCT.findall(text))
+    )
+
+
+def truncate(text: str, max_tokens: int, suffix: str = "…") -> str:
+    """Cut ``text`` at a word boundary so it (plus ``suffix``) fits ``max_tokens``."""
+    estimate = estimate_tokens(text)
+    if estimate <= max_tokens:
+        return text
+    room = max(max_tokens - estimate_tokens(suffix), 0)
+    cut = int(len(text) * room / estimate)
+    while cut > 0:
+        head = text[:cut].rsplit(" ", 1)[0]
+        if estimate_tokens(head) <= room:
+            return head + suffix
+        cut = int(cut * 0.9)
+    return suffix.strip()
+
+
+# ────────── assembly ─────────────────────────────────────────────────────────
+
+def score(kind: str, text: str) -> float:
+    """How much a block is worth to a prompt about the business."""
+    value = KIND_SCORES.get(kind, 1.0)
+    if kind == "text":
+        words = len(text.split())
+        if words < 6:  # "Home", "Contact us", "01234 567890"
+            return 0.2
+        value += min(len(SIGNAL_WORDS.findall(text)) * 10 / words, 4.0) + min(words / 40, 1.0)
+    if BOILERPLATE.search(text):
+        value *= 0.1
+    return value
+
+
+def assemble(blocks: list, budget: int) -> str:
+    """The highest-scoring ``(kind, text)`` blocks within ``budget`` tokens, one per line, in page order."""
+    seen, candidates = set(), []
+    for index, (kind, text) in enumerate(blocks):
+        key = text.lower()
+        if not text or key in seen:  # repeated footers, sliders, etc.
+            continue
+        seen.add(key)
+        candidates.append((score(kind, text), index, kind, text))
+
+    chosen, used = {}, 0
+    for _, index, kind, text in sorted(candidates, key=lambda c: (-c[0], c[1])):
+        line = LINE_PREFIXES.get(kind, "") + text
+        cost = estimate_tokens(line) + 1  # + newline
+        if used + cost > budget:
+            room = budget - used - 1
+            if kind != "text" or room < MIN_PARTIAL_TOKENS:
+                continue
+            line = truncate(line, room)
+            cost = estimate_tokens(line) + 1
+        chosen[index] = line
+        used += cost
+
+    dropped = len(candidates) - len(chosen)
+    metrics.incr("prompt_blocks_kept", len(chosen))
+    metrics.incr("prompt_blocks_dropped", dropped)
+    print(f"[Prompt] kept {len(chosen)}/{len(blocks)} blocks | ~{used}/{budget} tokens")
+    return "\n".join(chosen[index] for index in sorted(chosen))
+
+
+def blocks_from_text(text: str) -> list[tuple[str, str]]:
+    """Invert ``assemble``'s line format, so stored text can be re-fitted to a smaller budget."""
+    blocks = []
+    for line in text.splitlines():
+        for kind in ("title", "description", "h3", "h2", "h1"):
+            if line.startswith(LINE_PREFIXES[kind]):
+                blocks.append((kind, line[len(LINE_PREFIXES[kind]):]))
+                break
+        else:
+            blocks.append(("text", line))
+    return blocks
@@ -17,17 +17,11 @@ Extracted text (truncated):
 {extracted_text}
 """
 
-def get_audit_prompt(website, file_ids):
-    """
-    Generate a comprehensive prompt for the insurance audit report
-    """
-    today = datetime.date.today().strftime("%d %B %Y")
-    
-    return f"""You are an expert UK commercial insurance broker with over 30 years of experience. 
+# Fixed scaffolding shared by every audit. Kept free of per-request values so
+# it can sit in a cached system block (see get_audit_system_blocks).
+AUDIT_TEMPLATE = """You are an expert UK commercial insurance broker with over 30 years of experience. 
     Create an HTML document that EXACTLY matches the formatting and functionality of the example.
 
-    Website to analyze: {website}
-    
     CRITICAL FORMATTING REQUIREMENTS:
     1. Create a COMPLETE, standalone HTML document with ALL required styling and JavaScript
     2. Use EXACTLY the same HTML structure, CSS styling, and JavaScript as shown in the example
@@ -45,72 +39,72 @@ def get_audit_prompt(website, file_ids):
       <title>Joro High Level Insurance Review &amp; Recommendations</title>
       <style>
         /* Global Styles */
-        body {{
+        body {
           margin: 20px;
           line-height: 1.6;
           font-family: Arial, sans-serif;
           color: #333;
-        }}
-        h1, h2, h3, h4, h5 {{
+        }
+        h1, h2, h3, h4, h5 {
           margin-top: 1.2em;
           margin-bottom: 0.6em;
           font-weight: bold;
           color: #3a5a7c;
-        }}
-        p, ul, ol, table {{
+        }
+        p, ul, ol, table {
           margin-bottom: 1em;
-        }}
-        ul, ol {{
+        }
+        ul, ol {
           padding-left: 20px;
-        }}
+        }
 
         /* Heading Icon Style */
-        .heading-icon {{
+        .heading-icon {
           width: 48px;
           vertical-align: middle;
           margin-right: 8px;
-        }}
+        }
 
         /* Table Styles */
-        table {{
+        table {
           border-collapse: collapse;
           width: 100%;
           margin-bottom: 20px;
-        }}
-        table, th, td {{
+        }
+        table, th, td {
           border: 1px solid #ddd;
-        }}
-        th, td {{
+        }
+        th, td {
           padding: 6px 8px;
           text-align: left;
           vertical-align: top;
-        }}
-        th {{
+        }
+        th {
           background-color: #709fcc;
           color: #fff;
-        }}
+        }
         table.coverage-table tbody tr td:nth-child(1),
-        table.coverage-table tbody tr td:nth-child(2) {{
+        table.coverage-table tbody tr td:nth-child(2) {
           font-weight: bold;
-        }}
-        col.group-col1 {{ width: 15%; }}
-        col.group-col2 {{ width: 30%; }}
-        col.group-col3 {{ width: 25%; }}
-        col.group-col4 {{ width: 25%; }}
-        col.group-col5 {{ width: 5%; }}
+        }
+        col.group-col1 { width: 15%; }
+        col.group-col2 { width: 30%; }
+        col.group-col3 { width: 25%; }
+        col.group-col4 { width: 25%; }
+        col.group-col5 { width: 5%; }
 
         /* Category Color Styles & Icons */
-        .dark-red {{ color: #8B0000; }}
-        .mid-red {{ color: #B22222; }}
-        .orange-text {{ color: #FF4500; }}
-        .green-text {{ color: #008000; }}
-        .warning-icon::before {{ content: "⚠️ "; }}
-        .thumbs-up-icon::before {{ content: "👍 "; }}
-        .tick-icon {{ margin-left: 4px; }}
+        .dark-red { color: #8B0000; }
+        .mid-red { color: #B22222; }
+        .orange-text { color: #FF4500; }
+        .green-text { color: #008000; }
+        .warning-icon::before { content: "⚠️ "; }
+        .thumbs-up-icon::before { content: "👍 "; }
+        .tick-icon { margin-left: 4px; }
 
         /* Preference Buttons */
-        .preference-buttons {{ margin-top: 0.5em; }}
-        .pref-btn {{
+        .preference-buttons { margin-top: 0.5em; }
+        .pref-btn {
           display: inline-block;
           border: none;
           padding: 6px 14px;
@@ -122,23 +116,23 @@ def get_audit_prompt(website, file_ids):
           font-family: inherit;
           transition: background-color 0.3s ease;
           line-height: 1.2;
-        }}
-        .btn-essential {{
+        }
+        .btn-essential {
           background-color: #4fb57d;
-        }}
-        .btn-interested {{
+        }
+        .btn-interested {
           background-color: #f49547;
-        }}
-        .btn-notInterested {{
+        }
+        .btn-notInterested {
           background-color: #ef6460;
-        }}
-        .btn-unselected {{
+        }
+        .btn-unselected {
           background-color: #D3D3D3 !important;
           color: #555 !important;
-        }}
+        }
 
         /* Upload-to-profile Button */
-        .upload-profile-btn {{
+        .upload-profile-btn {
           display: inline-block;
           background-color: #4fb57d;
           color: #fff;
@@ -152,10 +146,10 @@ def get_audit_prompt(website, file_ids):
           transition: background-color 0.3s ease;
           margin-top: 1em;
           margin-bottom: 1em;
-        }}
-        .upload-profile-btn:hover {{
+        }
+        .upload-profile-btn:hover {
           background-color: #43a16b;
-        }}
+        }
       </style>
     </head>
     <body>
@@ -165,7 +159,7 @@ def get_audit_prompt(website, file_ids):
       <p>
         <strong>Prepared by:</strong> JORO<br>
         <strong>For:</strong> [COMPANY NAME]<br>
-        <strong>Date:</strong> {today}
+        <strong>Date:</strong> [DATE]
       </p>
 
       <h4>
@@ -223,28 +217,28 @@ def get_audit_prompt(website, file_ids):
       <!-- BENEFITS CONTENT WILL GO HERE -->
 
       <script>
-        document.addEventListener("DOMContentLoaded", function() {{
+        document.addEventListener("DOMContentLoaded", function() {
           const preferenceGroups = document.querySelectorAll('.preference-buttons');
 
-          preferenceGroups.forEach(group => {{
+          preferenceGroups.forEach(group => {
             const buttons = group.querySelectorAll('.pref-btn');
-            buttons.forEach(btn => {{
-              btn.addEventListener('click', function() {{
+            buttons.forEach(btn => {
+              btn.addEventListener('click', function() {
                 // Clear any existing selections in this group
-                buttons.forEach(sibling => {{
+                buttons.forEach(sibling => {
                   sibling.classList.add('btn-unselected');
                   sibling.innerHTML = sibling.getAttribute('data-label');
                   sibling.dataset.selected = "false";
-                }});
+                });
 
                 // Mark clicked button as selected and add tick
                 this.classList.remove('btn-unselected');
                 this.dataset.selected = "true";
                 this.innerHTML = this.getAttribute('data-label') + ' <span class="tick-icon">✓</span>';
-              }});
-            }});
-          }});
-        }});
+              });
+            });
+          });
+        });
       </script>
     </body>
     </html>
@@ -266,7 +260,7 @@ def get_audit_prompt(website, file_ids):
       <td>Annual cost range</td>
     </tr>
 
-    YOUR CONTENT SHOULD BE SPECIFIC TO THE {website} BUSINESS AND INCLUDE:
+    YOUR CONTENT SHOULD BE SPECIFIC TO THE CLIENT'S BUSINESS AND INCLUDE:
     
     1. Detailed overview of insurance needs for the specific industry
     2. At least 6-10 coverage types with detailed scenarios specific to the business
@@ -276,3 +270,196 @@ def get_audit_prompt(website, file_ids):
     
     DO NOT abbreviate or cut short any section. Create a COMPLETE report with ALL sections fully detailed.
     """
+
+
+def get_audit_system_blocks():
+    """
+    System blocks for the audit request; the whole prefix is marked for
+    Anthropic prompt caching
+    """
+    return [
+        {
+            "type": "text",
+            "text": AUDIT_TEMPLATE,
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+
+
+# Structured mode: Claude returns data only and the server renders the HTML
+# (see report.py), so none of the scaffolding above is needed.
+AUDIT_JSON_INSTRUCTIONS = """You are an expert UK commercial insurance broker with over 30 years of experience.
+Produce the content for a JORO High Level Insurance Review & Recommendations report.
+
+Respond with ONE JSON object and nothing else (no markdown fences, no HTML). Schema:
+{
+  "company": "Business name",
+  "overview": ["Paragraph summarising typical insurance needs for this industry and WHY each cover exists, in plain English", "..."],
+  "coverage": [
+    {
+      "coverage": "Coverage type, e.g. Public Liability",
+      "level": "critical | high | medium | low",
+      "category": "Short category description, e.g. Essential - legally required",
+      "scenario": "Industry-specific claim scenario",
+      "claim": "How to claim, with timeline and cost expectations",
+      "cost": "Annual cost range in GBP, e.g. £400 - £900"
+    }
+  ],
+  "red_flags": [
+    {"title": "Gap or risk", "detail": "Why it matters for this business", "example": "Real-life claim example"}
+  ],
+  "certificates": [
+    {"name": "Test or certificate", "detail": "What it involves", "saving": "Typical premium reduction"}
+  ],
+  "benefits": [
+    {"heading": "Financial advantages", "points": ["..."]},
+    {"heading": "Operational advantages", "points": ["..."]},
+    {"heading": "Competitive advantages", "points": ["..."]}
+  ]
+}
+
+Requirements:
+- 6-10 coverage rows, specific to the client's business
+- every string is plain text; do not include HTML tags
+- keep each field concise: one to three sentences
+"""
+
+
+def get_audit_json_system_blocks():
+    """
+    System blocks for structured (JSON) audit generation
+
+    Not marked for prompt caching: the instructions are ~450 tokens, under
+    the API's minimum cacheable prefix (1024), and the only longer shared
+    prefix would be the client context, which a single call never reuses.
+    """
+    return [
+        {
+            "type": "text",
+            "text": AUDIT_JSON_INSTRUCTIONS,
+        }
+    ]
+
+
+def get_audit_context(website, file_list, document_text, today=None, site_analysis=None):
+    """
+    Generate the business-context header shared by every audit request
+    """
+    today = today or datetime.date.today().strftime("%d %B %Y")
+
+    site = ""
+    if site_analysis:
+        site = f"""
+Business summary (from our earlier analysis of the website):
+{site_analysis.get("summary") or "Not available"}
+
+Website text (extract):
+{site_analysis["text"]}
+"""
+
+    return f"""Prepare the JORO insurance review for this client.
+
+Website to analyze: {website}
+Uploaded documents:
+{file_list}
+Date: {today}
+{site}
+Document extracts (use these to point out existing cover and gaps):
+{document_text}
+"""
+
+
+def get_audit_request(website, file_list, document_text, today=None, structured=False, site_analysis=None):
+    """
+    Generate the small per-request tail that follows the cached template
+    """
+    today = today or datetime.date.today().strftime("%d %B %Y")
+    if structured:
+        closing = "Return ONLY the JSON object described above."
+    else:
+        closing = (
+            f"Replace [DATE] with {today} and [COMPANY NAME] with the business name.\n"
+            "Return ONLY valid HTML (no markdown fences)."
+        )
+
+    return get_audit_context(website, file_list, document_text, today, site_analysis) + "\n" + closing + "\n"
+
+
+# Sections mode: each report section is generated by its own request and
+# stitched into the template skeleton server-side (see audit_sections.py).
+AUDIT_SECTION_INSTRUCTIONS = """You are an expert UK commercial insurance broker with over 30 years of experience.
+You are writing ONE section of a JORO High Level Insurance Review & Recommendations report.
+Other sections are written separately, so cover only the section you are asked for.
+
+Output rules:
+- Return ONLY an HTML fragment for the section body: no <html>, <head>, <body>, headings for the section itself, or markdown fences
+- You may use <p>, <ul>, <ol>, <li>, <strong>, <em>, <h5> and these classes:
+  dark-red, mid-red, orange-text, green-text (text colour), warning-icon, thumbs-up-icon (prefix icons)
+- Be specific to the client's business and industry; use UK terminology and GBP
+"""
+
+COVERAGE_ROW_EXAMPLE = AUDIT_TEMPLATE[
+    AUDIT_TEMPLATE.index("<tr>\n      <td>Coverage Name</td>") : AUDIT_TEMPLATE.index("YOUR CONTENT SHOULD BE")
+].strip()
+
+AUDIT_SECTION_BRIEFS = {
+    "overview": (
+        "Write section 1, OVERVIEW: two to four <p> paragraphs summarising the typical insurance "
+        "coverages for this industry and explaining WHY each one exists, without jargon."
+    ),
+    "coverage": (
+        "Write section 2, COVERAGE TABLE: 6-10 table rows (<tr> elements only, no <table> or <tbody>), "
+        "one per coverage type, each in exactly this format with working buttons:\n" + COVERAGE_ROW_EXAMPLE
+    ),
+    "red_flags": (
+        "Write section 3, RED FLAGS & REAL-LIFE SCENARIOS: a <ul> of potential gaps or risks "
+        "for this business, each with a real-life claim example."
+    ),
+    "certificates": (
+        "Write section 4, RECOMMENDED TESTS & CERTIFICATES: a <ul> of relevant tests and "
+        "certifications, each with the potential premium saving."
+    ),
+    "benefits": (
+        "Write section 5, BENEFITS OF ADDITIONAL STEPS: <h5> sub-headings for financial, "
+        "operational and competitive advantages, each followed by a <ul> of points."
+    ),
+}
+
+
+def get_audit_section_system_blocks(context):
+    """
+    System blocks shared by every per-section request of one audit
+
+    The instructions alone (~190 tokens) are below the API's minimum
+    cacheable prefix, so the cache marker goes after the business context:
+    the five sections and their retries then share one cached prefix.
+    """
+    return [
+        {
+            "type": "text",
+            "text": AUDIT_SECTION_INSTRUCTIONS,
+        },
+        {
+            "type": "text",
+            "text": context,
+            "cache_control": {"type": "ephemeral"},
+        },
+    ]
+
+
+def get_audit_section_request(section, brief=False):
+    """
+    Generate the request for one report section; the context is in the system blocks
+    """
+    request = AUDIT_SECTION_BRIEFS[section]
+    if brief:
+        request += "\nKeep it short: the essentials only, in as few words as possible."
+    return request
+
+
+def get_audit_prompt(website, file_ids):
+    """
+    Generate a comprehensive prompt for the insurance audit report
+    """
+    file_list = "\n".join(f"- {fid}" for fid in file_ids) or "No documents uploaded"
+    return AUDIT_TEMPLATE + "\n" + get_audit_request(website, file_list, "None")
@@ -0,0 +1,210 @@
+# report.py - Server-side rendering of the audit report from structured JSON
+"""
+In structured mode Claude returns compact JSON (overview, coverage rows, red
+flags, certificates, benefits) and the HTML is produced here. In sections
+mode each section arrives as its own HTML fragment and ``stitch`` places
+them into the same skeleton.
+
+The Jinja2 template is derived once, at import, from the HTML skeleton in
+``prompts.AUDIT_TEMPLATE``: the static markup is wrapped in ``{% raw %}``
+and each ``<!-- ... WILL GO HERE -->`` marker becomes a Jinja fragment, so
+the report layout has a single source of truth.
+"""
+
+import json
+import re
+
+from jinja2 import Environment
+
+import prompts
+
+SECTION_MARKERS = {
+    "company": "[COMPANY NAME]",
+    "date": "[DATE]",
+    "overview": "<!-- YOUR OVERVIEW CONTENT WILL GO HERE -->",
+    "coverage": "<!-- COVERAGE ROWS WILL GO HERE -->",
+    "red_flags": "<!-- RED FLAGS CONTENT WILL GO HERE -->",
+    "certificates": "<!-- CERTIFICATES CONTENT WILL GO HERE -->",
+    "benefits": "<!-- BENEFITS CONTENT WILL GO HERE -->",
+}
+
+# Coverage priority → CSS classes defined in the skeleton's <style> block.
+LEVEL_CLASSES = {
+    "critical": "dark-red warning-icon",
+    "high": "mid-red warning-icon",
+    "medium": "orange-text",
+    "low": "green-text thumbs-up-icon",
+}
+
+FRAGMENTS = {
+    "company": "{{ report.company or 'Your business' }}",
+    "date": "{{ date }}",
+    "overview": """\
+{% for paragraph in report.overview %}
+  <p>{{ paragraph }}</p>
+{% endfor %}""",
+    "coverage": """\
+{% for row in report.coverage %}
+          <tr>
+            <td>{{ row.coverage }}</td>
+            <td>
+              <p class="{{ level_classes.get(row.level, 'orange-text') }}">{{ row.category }}</p>
+              <p><strong>Preference for new policy</strong></p>
+              <div class="preference-buttons">
+                <button class="pref-btn btn-essential" data-label="Essential" data-selected="false">Essential</button>
+                <button class="pref-btn btn-interested" data-label="Interested / optional" data-selected="false">Interested / optional</button>
+                <button class="pref-btn btn-notInterested" data-label="Not interested" data-selected="false">Not interested</button>
+              </div>
+            </td>
+            <td>{{ row.scenario }}</td>
+            <td>{{ row.claim }}</td>
+            <td>{{ row.cost }}</td>
+          </tr>
+{% endfor %}""",
+    "red_flags": """\
+<ul>
+{% for flag in report.red_flags %}
+    <li><strong class="mid-red warning-icon">{{ flag.title }}</strong> {{ flag.detail }}
+    {% if flag.example %}<br><em>Real-life example:</em> {{ flag.example }}{% endif %}</li>
+{% endfor %}
+  </ul>""",
+    "certificates": """\
+<ul>
+{% for cert in report.certificates %}
+    <li><strong>{{ cert.name }}</strong> – {{ cert.detail }}
+    {% if cert.saving %}<br><span class="green-text">Potential saving: {{ cert.saving }}</span>{% endif %}</li>
+{% endfor %}
+  </ul>""",
+    "benefits": """\
+{% for group in report.benefits %}
+  <h5 class="thumbs-up-icon">{{ group.heading }}</h5>
+  <ul>
+  {% for point in group.points %}
+    <li>{{ point }}</li>
+  {% endfor %}
+  </ul>
+{% endfor %}""",
+}
+
+# Report body sections, in skeleton order.
+SECTIONS = ("overview", "coverage", "red_flags", "certificates", "benefits")
+REQUIRED_KEYS = SECTIONS
+
+# Row shapes for the list sections: (required fields, optional fields).
+ROW_FIELDS = {
+    "coverage": (("coverage", "level", "category", "scenario", "claim", "cost"), ()),
+    "red_flags": (("title", "detail"), ("example",)),
+    "certificates": (("name", "detail"), ("saving",)),
+    "benefits": (("heading", "points"), ()),
+}
+
+
+def skeleton_html() -> str:
+    """The example HTML document embedded in ``prompts.AUDIT_TEMPLATE``."""
+    text = prompts.AUDIT_TEMPLATE
+    doc = text[text.index("<!DOCTYPE html>") : text.index("</html>") + len("</html>")]
+    return re.sub(r"^    ", "", doc, flags=re.M)
+
+
+def template_source(fragments: dict[str, str]) -> str:
+    """Skeleton with static markup in raw blocks and markers swapped for ``fragments``."""
+    pattern = "|".join(re.escape(marker) for marker in SECTION_MARKERS.values())
+    by_marker = {marker: name for name, marker in SECTION_MARKERS.items()}
+
+    pieces = []
+    last = 0
+    skeleton = skeleton_html()
+    for match in re.finditer(pattern, skeleton):
+        pieces.append("{% raw %}" + skeleton[last : match.start()] + "{% endraw %}")
+        pieces.append(fragments[by_marker[match.group(0)]])
+        last = match.end()
+    pieces.append("{% raw %}" + skeleton[last:] + "{% endraw %}")
+    return "".join(pieces)
+
+
+_env = Environment(autoescape=True, trim_blocks=True, lstrip_blocks=True)
+_env.globals["level_classes"] = LEVEL_CLASSES
+REPORT_TEMPLATE = _env.from_string(template_source(FRAGMENTS))
+
+# Same skeleton, filled with HTML fragments generated section by section.
+STITCH_FRAGMENTS = {
+    "company": "{{ company }}",
+    "date": "{{ date }}",
+    **{name: "{{ sections.get('%s', '') | safe }}" % name for name in SECTIONS},
+}
+STITCH_TEMPLATE = _env.from_string(template_source(STITCH_FRAGMENTS))
+
+
+# ────────── model output handling ────────────────────────────────────────────
+
+class ReportFormatError(ValueError):
+    """Claude's reply was not a usable report JSON object."""
+
+
+def parse_report(text: str) -> dict:
+    """Parse the model's JSON, tolerating markdown fences or stray prose."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise ReportFormatError("no JSON object in Claude response")
+    try:
+        report = json.loads(text[start : end + 1])
+    except json.JSONDecodeError as exc:
+        raise ReportFormatError(f"invalid report JSON: {exc}") from exc
+
+    if not isinstance(report, dict):
+        raise ReportFormatError("report JSON is not an object")
+    missing = [key for key in REQUIRED_KEYS if key not in report]
+    if missing:
+        raise ReportFormatError(f"report JSON missing {', '.join(missing)}")
+    if isinstance(report["overview"], str):
+        report["overview"] = [report["overview"]]
+    _check_shape(report)
+    return report
+
+
+def is_report(text: str) -> bool:
+    """Whether ``parse_report`` accepts ``text``; only such replies are cached."""
+    try:
+        parse_report(text)
+    except ReportFormatError:
+        return False
+    return True
+
+
+def _is_text(value) -> bool:
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def _check_shape(report: dict) -> None:
+    """Raise ``ReportFormatError`` unless every section has the type the template iterates."""
+    if report.get("company") is not None and not _is_text(report["company"]):
+        raise ReportFormatError("report JSON: company must be a string")
+    if not isinstance(report["overview"], list) or not all(map(_is_text, report["overview"])):
+        raise ReportFormatError("report JSON: overview must be a list of strings")
+    for section, (required, optional) in ROW_FIELDS.items():
+        rows = report[section]
+        if not isinstance(rows, list):
+            raise ReportFormatError(f"report JSON: {section} must be a list")
+        for n, row in enumerate(rows, 1):
+            if not isinstance(row, dict):
+                raise ReportFormatError(f"report JSON: {section} row {n} must be an object")
+            for field in required:
+                value = row.get(field)
+                if field == "points":
+                    ok = isinstance(value, list) and all(map(_is_text, value))
+                else:
+                    ok = _is_text(value)
+                if not ok:
+                    raise ReportFormatError(f"report JSON: {section} row {n} has a bad or missing {field}")
+            for field in optional:
+                if row.get(field) is not None and not _is_text(row[field]):
+                    raise ReportFormatError(f"report JSON: {section} row {n} has a bad {field}")
+
+
+def render(report: dict, date: str) -> str:
+    return REPORT_TEMPLATE.render(report=report, date=date)
+
+
+def stitch(sections: dict[str, str], company: str, date: str) -> str:
+    """Place per-section HTML fragments into the skeleton, in skeleton order."""
+    return STITCH_TEMPLATE.render(sections=sections, company=company, date=date)
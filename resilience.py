@@ -0,0 +1,439 @@
+# resilience.py - Retry, throttling, circuit breaking and hedging for Claude calls
+"""
+Building blocks used by ``app.call_claude`` / ``app.stream_claude``:
+
+* ``send`` – jittered exponential backoff on 429/5xx/529 that honours
+  ``retry-after``, behind a circuit breaker and a rate limiter
+* ``throttle`` – token buckets (requests/min and input tokens/min) kept in
+  SQLite so every gunicorn worker draws from the same budget
+* ``CircuitBreaker`` – fails fast after repeated upstream failures
+* ``hedged`` – fires a duplicate request when the first one is slower than
+  the observed p95, and returns whichever finishes first; at most
+  ``CLAUDE_HEDGE_MAX`` duplicates are in flight per process
+
+``send_async`` / ``hedged_async`` are the same policies for the async app
+(``asgi.py``); the breaker, buckets and latency samples are shared.
+
+Retries, throttle waits, breaker transitions and hedges are all counted in
+``metrics``.
+"""
+
+import email.utils
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import anyio
+import httpx
+import requests
+
+import metrics
+import storage
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+MAX_RETRIES = int(os.getenv("CLAUDE_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("CLAUDE_BACKOFF_BASE", "1.0"))
+BACKOFF_CAP = float(os.getenv("CLAUDE_BACKOFF_CAP", "30"))
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504, 529}
+
+RPM = float(os.getenv("CLAUDE_RPM", "50"))  # 0 disables
+TPM = float(os.getenv("CLAUDE_TPM", "50000"))  # input tokens; 0 disables
+THROTTLE_MAX_WAIT = float(os.getenv("CLAUDE_THROTTLE_MAX_WAIT", "30"))
+
+BREAKER_THRESHOLD = int(os.getenv("CLAUDE_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("CLAUDE_BREAKER_COOLDOWN", "30"))
+
+HEDGE_ENABLED = os.getenv("CLAUDE_HEDGE", "1") != "0"
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY = float(os.getenv("CLAUDE_HEDGE_DELAY", "8"))
+HEDGE_MAX_IN_FLIGHT = int(os.getenv("CLAUDE_HEDGE_MAX", "8"))  # per process; extra hedges are skipped
+
+
+class ClaudeUnavailable(RuntimeError):
+    """The breaker is open or the rate budget could not be obtained in time."""
+
+
+# ────────── backoff ──────────────────────────────────────────────────────────
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Parse a ``retry-after`` header given as seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: str | None = None) -> float:
+    """Full-jitter exponential delay, never shorter than the server asked for."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    server = retry_after_seconds(retry_after)
+    return max(delay, server) if server is not None else delay
+
+
+# ────────── shared token buckets ─────────────────────────────────────────────
+
+_DB = "ratelimit.db"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name    TEXT PRIMARY KEY,
+    tokens  REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+def _take(name: str, amount: float, per_minute: float) -> float:
+    """Consume ``amount`` from bucket ``name``; return seconds to wait if short."""
+    capacity = per_minute
+    rate = per_minute / 60.0
+    amount = min(amount, capacity)  # a single oversized call must still get through
+    now = time.time()
+
+    conn = storage.connect(_DB, _SCHEMA)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+        tokens = capacity if row is None else min(capacity, row["tokens"] + (now - row["updated"]) * rate)
+        if tokens >= amount:
+            tokens -= amount
+            wait_for = 0.0
+        else:
+            wait_for = (amount - tokens) / rate
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+            (name, tokens, now),
+        )
+    finally:
+        conn.execute("COMMIT")
+    return wait_for
+
+
+def _throttle_waits(estimated_tokens: int):
+    """Yield the seconds to sleep until both budgets allow another call."""
+    deadline = time.monotonic() + THROTTLE_MAX_WAIT
+    for name, amount, per_minute in (("requests", 1, RPM), ("input_tokens", estimated_tokens, TPM)):
+        if per_minute <= 0:
+            continue
+        while True:
+            wait_for = _take(name, amount, per_minute)
+            if not wait_for:
+                break
+            if time.monotonic() + wait_for > deadline:
+                metrics.incr("claude_throttle_rejections")
+                raise ClaudeUnavailable(f"Claude {name.replace('_', ' ')} budget exhausted; try again shortly")
+            metrics.incr("claude_throttle_waits")
+            metrics.incr("claude_throttle_seconds", wait_for)
+            yield wait_for
+
+
+def throttle(estimated_tokens: int) -> None:
+    """Block until both the request and token budgets allow another call."""
+    for wait_for in _throttle_waits(estimated_tokens):
+        time.sleep(wait_for)
+
+
+async def throttle_async(estimated_tokens: int) -> None:
+    waits = _throttle_waits(estimated_tokens)
+    # Each step touches SQLite, so run it off the event loop.
+    while (wait_for := await anyio.to_thread.run_sync(next, waits, None)) is not None:
+        await anyio.sleep(wait_for)
+
+
+# ────────── circuit breaker ──────────────────────────────────────────────────
+
+class CircuitBreaker:
+    """Per-process breaker: closed → open after N failures → half-open trial."""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """Raise if calls are blocked; True when this call is the half-open trial."""
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half_open" and self._trial_in_flight):
+                metrics.incr("claude_breaker_rejections")
+                raise ClaudeUnavailable("Claude API is failing; circuit breaker is open")
+            if state == "half_open":
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def release_trial(self) -> None:
+        """Free the trial slot when the trial ended without an outcome (cancelled, crashed)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                print("[Claude] circuit breaker closed")
+                metrics.incr("claude_breaker_closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    print(f"[Claude] circuit breaker opened after {self.failures} failures")
+                metrics.incr("claude_breaker_opened")
+                self.opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN)
+
+
+# ────────── resilient send ───────────────────────────────────────────────────
+
+def _retry_delay(attempt: int, resp=None, exc: Exception | None = None) -> float | None:
+    """Seconds to wait before retrying, or None when this outcome is final."""
+    if exc is None and resp.status_code not in RETRY_STATUSES:
+        breaker.record_success()
+        return None
+    if attempt == MAX_RETRIES:
+        breaker.record_failure()
+        return None
+
+    if exc is not None:
+        delay = backoff_delay(attempt)
+        print(f"[Claude] {type(exc).__name__} – retry {attempt + 1} in {delay:.1f}s")
+    else:
+        delay = backoff_delay(attempt, resp.headers.get("retry-after"))
+        print(f"[Claude] status {resp.status_code} – retry {attempt + 1} in {delay:.1f}s")
+        metrics.incr(f"claude_retry_status_{resp.status_code}")
+    metrics.incr("claude_retries")
+    metrics.incr("claude_retry_seconds", delay)
+    return delay
+
+
+def send(do_request, *, estimated_tokens: int = 0) -> requests.Response:
+    """Run ``do_request()`` with throttling, retries and the circuit breaker.
+
+    Returns the final response (possibly still an error status once retries
+    are used up); network errors on the last attempt propagate.
+    """
+    # Throttle first: a budget rejection must not take the half-open trial slot.
+    throttle(estimated_tokens)
+    trial = breaker.before_call()
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                throttle(estimated_tokens)  # retries draw on the shared budgets too
+            try:
+                resp = do_request()
+            except requests.RequestException as exc:
+                delay = _retry_delay(attempt, exc=exc)
+                if delay is None:
+                    raise
+            else:
+                delay = _retry_delay(attempt, resp)
+                if delay is None:
+                    return resp
+                resp.close()
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+    finally:
+        # No-op after record_success/record_failure; otherwise the next caller gets the trial.
+        if trial:
+            breaker.release_trial()
+
+
+async def send_async(do_request, *, estimated_tokens: int = 0) -> httpx.Response:
+    """``send`` for coroutines returning ``httpx.Response``."""
+    await throttle_async(estimated_tokens)
+    trial = breaker.before_call()
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                await throttle_async(estimated_tokens)
+            try:
+                resp = await do_request()
+            except httpx.TransportError as exc:
+                delay = _retry_delay(attempt, exc=exc)
+                if delay is None:
+                    raise
+            else:
+                delay = _retry_delay(attempt, resp)
+                if delay is None:
+                    return resp
+                await resp.aclose()
+            await anyio.sleep(delay)
+        raise AssertionError("unreachable")
+    finally:
+        # Also runs when a cancel scope (section timeout, disconnect) interrupts the trial.
+        if trial:
+            breaker.release_trial()
+
+
+# ────────── hedged requests ──────────────────────────────────────────────────
+
+_latencies: dict[str, deque] = {}
+_hedge_pool = None
+_hedge_pid: int | None = None
+_hedge_lock = threading.Lock()
+_hedge_slots = threading.BoundedSemaphore(HEDGE_MAX_IN_FLIGHT)
+
+
+def record_latency(kind: str, seconds: float) -> None:
+    with _hedge_lock:
+        _latencies.setdefault(kind, deque(maxlen=200)).append(seconds)
+
+
+def p95(kind: str) -> float | None:
+    with _hedge_lock:
+        samples = sorted(_latencies.get(kind, ()))
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    return samples[int(len(samples) * 0.95) - 1]
+
+
+def _get_hedge_pool() -> ThreadPoolExecutor:
+    global _hedge_pool, _hedge_pid
+    with _hedge_lock:
+        if _hedge_pool is None or _hedge_pid != os.getpid():
+            _hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_MAX_IN_FLIGHT, thread_name_prefix="claude-hedge")
+            _hedge_pid = os.getpid()
+    return _hedge_pool
+
+
+def _take_hedge_slot() -> bool:
+    if _hedge_slots.acquire(blocking=False):
+        return True
+    metrics.incr("claude_hedges_skipped")
+    return False
+
+
+def _run_hedge(fn):
+    try:
+        return fn()
+    finally:
+        _hedge_slots.release()
+
+
+def hedged(kind: str, fn):
+    """Call ``fn()``; if it outlives the p95 for ``kind``, race a duplicate.
+
+    The primary gets its own thread straight away, so it never queues behind
+    other calls. Only the primary's own completion time feeds the p95, even
+    when a hedge answered first. Only duplicates use the hedge pool; when all ``HEDGE_MAX_IN_FLIGHT`` slots are taken the hedge
+    is skipped rather than queued.
+    """
+    if not HEDGE_ENABLED:
+        return fn()
+
+    started = time.monotonic()
+    delay = p95(kind) or HEDGE_DEFAULT_DELAY
+    primary = Future()
+
+    def run_primary():
+        try:
+            value = fn()
+        except BaseException as exc:
+            primary.set_exception(exc)
+        else:
+            # The primary's own time, even when a hedge already answered the caller.
+            record_latency(kind, time.monotonic() - started)
+            primary.set_result(value)
+
+    threading.Thread(target=run_primary, name="claude-primary", daemon=True).start()
+    done, pending = wait({primary}, timeout=delay)
+    if not done and _take_hedge_slot():
+        metrics.incr("claude_hedges")
+        print(f"[Claude] {kind} slower than p95 ({delay:.1f}s) – sending hedge")
+        pending.add(_get_hedge_pool().submit(_run_hedge, fn))
+
+    error = None
+    while done or pending:
+        for future in done:
+            if future.exception() is None:
+                if pending:
+                    metrics.incr("claude_hedge_wasted")
+                return future.result()
+            error = future.exception()
+        if not pending:
+            break
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+    raise error
+
+
+async def hedged_async(kind: str, fn):
+    """``hedged`` for coroutine functions; the losing attempt is cancelled."""
+    if not HEDGE_ENABLED:
+        return await fn()
+
+    started = time.monotonic()
+    delay = p95(kind) or HEDGE_DEFAULT_DELAY
+    outcome: dict = {"launched": 1, "errors": []}
+    settled = anyio.Event()
+
+    async def attempt(hedge: bool = False):
+        try:
+            value = await fn()
+        except Exception as exc:
+            outcome["errors"].append(exc)
+            if len(outcome["errors"]) == outcome["launched"]:
+                settled.set()
+            return
+        finally:
+            if hedge:
+                _hedge_slots.release()
+        if not hedge:  # a primary cancelled after a hedge won records nothing
+            record_latency(kind, time.monotonic() - started)
+        if "value" not in outcome:
+            outcome["value"] = value
+            settled.set()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(attempt)
+        with anyio.move_on_after(delay):
+            await settled.wait()
+        if not settled.is_set() and _take_hedge_slot():
+            metrics.incr("claude_hedges")
+            print(f"[Claude] {kind} slower than p95 ({delay:.1f}s) – sending hedge")
+            outcome["launched"] = 2
+            tg.start_soon(attempt, True)
+            await settled.wait()
+        elif not settled.is_set():
+            await settled.wait()
+            if "value" in outcome:
+                metrics.incr("claude_hedge_cancelled")
+        tg.cancel_scope.cancel()
+
+    if "value" not in outcome:
+        raise outcome["errors"][-1]
+    return outcome["value"]
+
+
+def stats() -> dict:
+    return {
+        "breaker_state": breaker.state,
+        "breaker_failures": breaker.failures,
+        "hedge_p95_seconds": {kind: p95(kind) for kind in list(_latencies)},
+    }
@@ -0,0 +1,222 @@
+# speculation.py - Speculative no-documents audits started right after analysis
+"""
+Most brokers click "generate" a few seconds after analysing a site, often
+without uploading anything. With ``AUDIT_SPECULATE=1`` a successful
+analysis ``start``s that audit in a small background pool, and
+``/api/generate-audit`` (or a queued job) ``attach``es to it instead of
+starting from scratch:
+
+* finished results are kept in SQLite, so any worker can claim them
+* a generate that arrives while the audit is still running waits for it,
+  for up to ``AUDIT_SPECULATE_TIMEOUT`` seconds from when it started
+
+At most ``AUDIT_SPECULATE_WORKERS`` run at once per process; when they are
+busy, new speculations are skipped rather than queued. A run that overruns
+the timeout gives up its slot straight away and its result is discarded.
+Unclaimed results expire after ``AUDIT_SPECULATE_TTL``. Their tokens are then counted as wasted, so
+``stats()`` can report both the hit rate and the wasted-token rate.
+"""
+
+import contextvars
+import datetime
+import os
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import analysis_store
+import metrics
+import storage
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+ENABLED = os.getenv("AUDIT_SPECULATE", "0") == "1"
+WORKERS = int(os.getenv("AUDIT_SPECULATE_WORKERS", "2"))  # per process
+TIMEOUT = float(os.getenv("AUDIT_SPECULATE_TIMEOUT", "120"))
+TTL = int(os.getenv("AUDIT_SPECULATE_TTL", "900"))
+POLL_INTERVAL = 0.25
+
+_DB = "speculation.db"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS speculations (
+    key         TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    result      TEXT,
+    tokens      INTEGER NOT NULL DEFAULT 0,
+    started_at  REAL NOT NULL,
+    finished_at REAL
+);
+"""
+
+
+def _db():
+    return storage.connect(_DB, _SCHEMA)
+
+
+def _key(website: str, mode: str) -> str:
+    # The date is part of the report, so yesterday's speculation never matches.
+    return f"{analysis_store.normalise_url(website)}|{mode}|{datetime.date.today().isoformat()}"
+
+
+# ────────── runs ─────────────────────────────────────────────────────────────
+
+# key → (future, started_at) for this process's runs still within TIMEOUT.
+_futures: dict[str, tuple[Future, float]] = {}
+_futures_pid: int | None = None
+_lock = threading.Lock()
+
+
+def _in_flight(now: float) -> int:
+    """Runs holding a slot; call with ``_lock`` held. Overrun runs lose theirs."""
+    global _futures_pid
+    if _futures_pid != os.getpid():  # threads don't survive a fork
+        _futures.clear()
+        _futures_pid = os.getpid()
+    for key, (_, started_at) in list(_futures.items()):
+        if started_at < now - TIMEOUT:
+            del _futures[key]
+            metrics.incr("speculation_overrun")
+    return len(_futures)
+
+
+def _expire(now: float) -> None:
+    """Drop unclaimed results, overrun runs and old failures, counting unclaimed tokens as wasted."""
+    expired = _db().execute(
+        "DELETE FROM speculations WHERE (status IN ('done', 'failed') AND finished_at < ?) "
+        "OR (status = 'running' AND started_at < ?) RETURNING status, tokens",
+        (now - TTL, now - TIMEOUT),
+    ).fetchall()
+    # Failed runs counted their tokens as wasted when they finished.
+    unclaimed = [row for row in expired if row["status"] != "failed"]
+    if unclaimed:
+        metrics.incr("speculation_expired", len(unclaimed))
+        metrics.incr("speculation_tokens_wasted", sum(row["tokens"] for row in unclaimed))
+
+
+def _run(key: str, started_at: float, website: str, mode: str, generate) -> str:
+    timer = metrics.start_background("speculative_audit")
+    status, result = "failed", None
+    try:
+        result = generate(website, [], mode=mode, use_cache=True)
+        status = "done"
+        return result
+    finally:
+        elapsed = timer.finish(200 if status == "done" else 500)
+        tokens = timer.tokens["input"] + timer.tokens["output"]
+        if elapsed > TIMEOUT:
+            status, result = "failed", None  # nobody is waiting any more
+        if status == "failed":
+            metrics.incr("speculation_failed")
+            metrics.incr("speculation_tokens_wasted", tokens)
+        # started_at guards against overwriting a newer run after this one's row expired.
+        _db().execute(
+            "UPDATE speculations SET status = ?, result = ?, tokens = ?, finished_at = ? "
+            "WHERE key = ? AND started_at = ?",
+            (status, result, tokens, time.time(), key, started_at),
+        )
+        with _lock:
+            if key in _futures and _futures[key][1] == started_at:
+                del _futures[key]
+
+
+def _run_into(future: Future, *args) -> None:
+    try:
+        future.set_result(_run(*args))
+    except BaseException as exc:
+        future.set_exception(exc)
+
+
+def start(website: str, mode: str, generate) -> bool:
+    """Begin a speculative no-documents audit unless disabled, busy or already known.
+
+    ``generate`` is ``app.generate_audit_html``.
+    """
+    if not ENABLED:
+        return False
+    now = time.time()
+    _expire(now)
+
+    key = _key(website, mode)
+    with _lock:
+        if _in_flight(now) >= WORKERS:
+            metrics.incr("speculation_skipped_busy")
+            return False
+        # A failed run must not block the site for the rest of the day: retry over it.
+        claimed = _db().execute(
+            "INSERT INTO speculations (key, status, started_at) VALUES (?, 'running', ?) "
+            "ON CONFLICT (key) DO UPDATE SET status = 'running', result = NULL, tokens = 0, "
+            "started_at = excluded.started_at, finished_at = NULL WHERE speculations.status = 'failed'",
+            (key, now),
+        ).rowcount
+        if not claimed:
+            return False
+        # A thread per run, not a pool, so an overrun run cannot hold up new ones.
+        # Fresh context: the speculative run gets its own RequestTimer.
+        future = Future()
+        _futures[key] = (future, now)
+        threading.Thread(
+            target=contextvars.Context().run,
+            args=(_run_into, future, key, now, website, mode, generate),
+            name="audit-speculate",
+            daemon=True,
+        ).start()
+    metrics.incr("speculation_started")
+    print(f"[Speculate] started {mode} audit for {website}")
+    return True
+
+
+def attach(website: str, file_ids: list[str], mode: str) -> str | None:
+    """HTML from a matching speculation, waiting for one in flight; None on a miss."""
+    if not ENABLED or file_ids:
+        return None
+
+    key = _key(website, mode)
+    with _lock:
+        future, _ = _futures.get(key, (None, None))
+    row = _db().execute("SELECT status, started_at FROM speculations WHERE key = ?", (key,)).fetchone()
+    if row is None or row["status"] == "failed":
+        metrics.incr("speculation_misses")
+        return None
+
+    deadline = row["started_at"] + TIMEOUT
+    if future is not None:
+        try:
+            future.result(timeout=max(deadline - time.time(), 0))
+        except FutureTimeout:
+            pass
+        except Exception:  # the run already recorded itself as failed
+            pass
+    while time.time() < deadline:
+        row = _db().execute("SELECT status FROM speculations WHERE key = ?", (key,)).fetchone()
+        if row is None or row["status"] != "running":
+            break
+        time.sleep(POLL_INTERVAL)
+
+    claimed = _db().execute(
+        "DELETE FROM speculations WHERE key = ? AND status = 'done' RETURNING result, tokens", (key,)
+    ).fetchone()
+    if claimed is None:
+        metrics.incr("speculation_misses")
+        return None
+    metrics.incr("speculation_hits")
+    metrics.incr("speculation_tokens_used", claimed["tokens"])
+    print(f"[Speculate] attached to {mode} audit for {website}")
+    return claimed["result"]
+
+
+def stats() -> dict:
+    """This worker's hit rate and wasted-token rate, plus shared in-flight count."""
+    if not ENABLED:
+        return {"enabled": False}
+    counters = metrics.snapshot()
+    hits, misses = counters.get("speculation_hits", 0), counters.get("speculation_misses", 0)
+    used, wasted = counters.get("speculation_tokens_used", 0), counters.get("speculation_tokens_wasted", 0)
+    running = _db().execute("SELECT COUNT(*) FROM speculations WHERE status = 'running'").fetchone()[0]
+    return {
+        "enabled": True,
+        "running": running,
+        "started": counters.get("speculation_started", 0),
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+        "wasted_token_rate": round(wasted / (used + wasted), 3) if used + wasted else None,
+    }
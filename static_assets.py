@@ -0,0 +1,149 @@
+# static_assets.py - Normalised, minified and precompressed static files
+"""
+``static/index.html`` is kept as a Cocoa "HTML Writer" export: every source
+line is wrapped in ``<p class="p1"><span class="s1">…`` with the real markup
+HTML-escaped and indentation stored as non-breaking spaces. ``build`` turns
+that back into the page it encodes, minifies it conservatively (whitespace
+and comments only; no token rewriting), and precomputes gzip and brotli
+bodies with a content-hash ETag. ``brotli`` is in requirements.txt; without
+it (a hand-built environment) only gzip is served.
+
+Assets are built on first request and rebuilt when the file's mtime
+changes, so editing the export in development still shows up on reload.
+"""
+
+import gzip
+import hashlib
+import html
+import mimetypes
+import os
+import re
+import threading
+
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # listed in requirements.txt; gzip alone still cuts the page by ~75%
+    brotli = None
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+MAX_AGE = int(os.getenv("STATIC_MAX_AGE", str(24 * 3600)))  # non-HTML assets
+MIN_COMPRESS_BYTES = 1024
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+_EXPORT_MARKER = '<meta name="Generator" content="Cocoa HTML Writer">'
+_EXPORT_LINE = re.compile(r'^<p class="p\d+">')
+_EXPORT_TAGS = re.compile(r"</?(?:p|span)\b[^>]*>|<br>")
+_RAW_BLOCKS = re.compile(r"(<script\b.*?</script>|<style\b.*?</style>|<pre\b.*?</pre>|<textarea\b.*?</textarea>)", re.S | re.I)
+_HTML_COMMENT = re.compile(r"<!--(?!\[if).*?-->", re.S)
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+
+
+# ────────── transforms ───────────────────────────────────────────────────────
+
+def normalise(source: str) -> str:
+    """Decode a Cocoa HTML export back to the markup it displays; other HTML is returned as is."""
+    if _EXPORT_MARKER not in source:
+        return source
+    lines = []
+    for line in source.split("\n"):
+        if _EXPORT_LINE.match(line):
+            lines.append(html.unescape(_EXPORT_TAGS.sub("", line).replace("\xa0", " ")))
+    return "\n".join(lines)
+
+
+def _trimmed_lines(text: str) -> list[str]:
+    return [line.strip() for line in text.split("\n") if line.strip()]
+
+
+def minify(markup: str) -> str:
+    """Drop indentation, blank lines and comments; line breaks are kept so JS ASI is unaffected."""
+    pieces = []
+    for n, piece in enumerate(_RAW_BLOCKS.split(markup)):
+        if n % 2 == 0:  # markup between raw blocks
+            pieces.append("\n".join(_trimmed_lines(_HTML_COMMENT.sub("", piece))))
+        elif piece[:6].lower() == "<style":
+            pieces.append(" ".join(_trimmed_lines(_CSS_COMMENT.sub("", piece))))
+        elif piece[:7].lower() == "<script":
+            pieces.append("\n".join(line for line in _trimmed_lines(piece) if not line.startswith("//")))
+        else:  # <pre>, <textarea>: whitespace is content
+            pieces.append(piece)
+    return "\n".join(piece for piece in pieces if piece)
+
+
+# ────────── assets ───────────────────────────────────────────────────────────
+
+class Asset:
+    """One static file with its precomputed encodings."""
+
+    def __init__(self, body: bytes, mimetype: str, mtime: float):
+        self.mimetype = mimetype
+        self.mtime = mtime
+        self.hash = hashlib.sha256(body).hexdigest()[:20]
+        self.bodies = {"identity": body}
+        if mimetype.startswith(COMPRESSIBLE) and len(body) >= MIN_COMPRESS_BYTES:
+            self.bodies["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.bodies["br"] = brotli.compress(body, quality=11)
+        # HTML has a fixed URL, so it must be revalidated; the ETag makes that a cheap 304.
+        self.cache_control = "no-cache" if mimetype == "text/html" else f"public, max-age={MAX_AGE}"
+
+    def etag(self, encoding: str) -> str:
+        """Unquoted ETag; each encoding gets its own so caches never mix bodies."""
+        return self.hash if encoding == "identity" else f"{self.hash}-{encoding}"
+
+    def matches(self, tags: set[str]) -> bool:
+        """True if any If-None-Match tag names this content in any encoding."""
+        return any(tag.split("-", 1)[0] == self.hash for tag in tags)
+
+    def negotiate(self, accept_encoding: str) -> str:
+        """Best available encoding the client accepts (br > gzip > identity)."""
+        accepted = {}
+        for item in accept_encoding.split(","):
+            coding, _, params = item.strip().partition(";")
+            q = re.search(r"q=([\d.]+)", params)
+            accepted[coding.strip().lower()] = float(q.group(1)) if q else 1.0
+        for encoding in ("br", "gzip"):
+            if encoding in self.bodies and accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return encoding
+        return "identity"
+
+
+def build(path: str) -> Asset:
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    mtime = os.path.getmtime(path)
+    with open(path, "rb") as fh:
+        body = fh.read()
+    if mimetype == "text/html":
+        body = minify(normalise(body.decode("utf-8"))).encode("utf-8")
+    return Asset(body, mimetype, mtime)
+
+
+_assets: dict[str, Asset] = {}
+_lock = threading.Lock()
+
+
+def get(static_dir: str, name: str) -> Asset | None:
+    """The built asset for ``name`` under ``static_dir``, or None if there is no such file."""
+    path = safe_join(static_dir, name)
+    if path is None or not os.path.isfile(path):
+        return None
+    mtime = os.path.getmtime(path)
+    asset = _assets.get(path)
+    if asset is None or asset.mtime != mtime:
+        asset = build(path)
+        with _lock:
+            _assets[path] = asset
+    return asset
+
+
+if __name__ == "__main__":
+    import sys
+
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "static", "index.html")
+    asset = build(target)
+    print(f"{target}: source {os.path.getsize(target)} B")
+    for encoding, body in asset.bodies.items():
+        print(f"  {encoding:8} {len(body):7d} B  etag {asset.etag(encoding)}")
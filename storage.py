@@ -0,0 +1,51 @@
+# storage.py - Shared on-disk state (SQLite) visible to every gunicorn worker
+"""
+Small helper around ``sqlite3`` so the caches, indexes and queues that need
+to be shared between worker processes all live in one state directory and
+open their databases the same way (WAL, busy timeout, one connection per
+thread per process).
+"""
+
+import os
+import pathlib
+import sqlite3
+import tempfile
+import threading
+
+STATE_DIR = pathlib.Path(
+    os.getenv("JORO_STATE_DIR", str(pathlib.Path(tempfile.gettempdir()) / "joro_state"))
+)
+STATE_DIR.mkdir(parents=True, exist_ok=True)
+
+_local = threading.local()
+_schemas_applied: set[tuple[int, str]] = set()
+_schema_lock = threading.Lock()
+
+
+def connect(name: str, schema: str = "") -> sqlite3.Connection:
+    """Return a cached connection to ``STATE_DIR / name`` for this thread.
+
+    ``schema`` is executed once per process the first time the database is
+    opened, so callers can pass their ``CREATE TABLE IF NOT EXISTS`` block on
+    every call.
+    """
+    pid = os.getpid()
+    conns = getattr(_local, "conns", None)
+    if conns is None or getattr(_local, "pid", None) != pid:
+        conns = _local.conns = {}
+        _local.pid = pid
+
+    conn = conns.get(name)
+    if conn is None:
+        conn = sqlite3.connect(STATE_DIR / name, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conns[name] = conn
+
+    if schema and (pid, name) not in _schemas_applied:
+        with _schema_lock:
+            if (pid, name) not in _schemas_applied:
+                conn.executescript(schema)
+                _schemas_applied.add((pid, name))
+    return conn
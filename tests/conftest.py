@@ -0,0 +1,10 @@
+import os
+import pathlib
+import sys
+import tempfile
+
+# Keep SQLite state (rate buckets, caches) out of the real state directory.
+os.environ.setdefault("JORO_STATE_DIR", tempfile.mkdtemp(prefix="joro_test_"))
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
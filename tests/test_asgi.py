@@ -0,0 +1,57 @@
+import anyio
+
+import asgi
+
+
+def receiver(chunks):
+    messages = iter(chunks)
+
+    async def receive():
+        chunk = next(messages, None)
+        return {"type": "http.request", "body": chunk or b"", "more_body": chunk is not None}
+
+    return receive
+
+
+def test_large_bridged_body_is_spooled_to_disk(monkeypatch):
+    monkeypatch.setattr(asgi, "SPOOL_BYTES", 1024)
+    body, size = anyio.run(asgi._spool_body, receiver([b"x" * 800] * 4), 10_000)
+    assert size == 3200
+    assert body._rolled  # on disk, not in memory
+    assert body.read() == b"x" * 3200
+
+
+def test_chunked_upload_over_the_limit_gets_413(monkeypatch):
+    monkeypatch.setitem(asgi.wsgi.app.config, "MAX_CONTENT_LENGTH", 1000)
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/upload-file",
+        "query_string": b"",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=x")],
+    }
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    anyio.run(asgi.app, scope, receiver([b"x" * 600] * 3), send)
+    assert sent[0]["status"] == 413
+
+
+def test_native_route_body_over_the_limit_gets_413(monkeypatch):
+    monkeypatch.setitem(asgi.wsgi.app.config, "MAX_CONTENT_LENGTH", 1000)
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/analyse-website",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+    }
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    anyio.run(asgi.app, scope, receiver([b" " * 600] * 3), send)
+    assert sent[0]["status"] == 413
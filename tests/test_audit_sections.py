@@ -0,0 +1,59 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import audit_sections
+import report
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    """Record the fragments handed to ``report.stitch`` instead of rendering them."""
+    stitched = []
+    monkeypatch.setattr(report, "stitch", lambda sections, company, date: stitched.append(sections) or "")
+    monkeypatch.setattr(audit_sections, "SECTION_TIMEOUT", 0.5)
+    monkeypatch.setattr(audit_sections, "RETRY_TIMEOUT", 0.3)
+    return stitched
+
+
+def test_concurrent_audits_do_not_time_out_in_a_queue(captured):
+    def call(prompt, **kwargs):
+        time.sleep(0.3)
+        return "<p>ok</p>"
+
+    def audit(_):
+        return audit_sections.generate("context", call, company="Acme", date="today")
+
+    with ThreadPoolExecutor(max_workers=4) as callers:
+        list(callers.map(audit, range(4)))
+    assert len(captured) == 4
+    for sections in captured:
+        assert set(sections.values()) == {"<p>ok</p>"}
+
+
+def test_slow_section_is_retried_then_replaced(captured):
+    def call(prompt, max_tokens, **kwargs):
+        coverage = audit_sections.SECTION_MAX_TOKENS["coverage"]
+        if max_tokens in (coverage, coverage // 2):
+            time.sleep(1)
+        return "<p>ok</p>"
+
+    audit_sections.generate("context", call, company="Acme", date="today")
+    (sections,) = captured
+    assert sections["coverage"] == audit_sections.FAILED_SECTION_HTML
+    assert sections["overview"] == "<p>ok</p>"
+
+
+def test_sections_share_a_cached_context_prefix(captured):
+    systems, prompts = [], []
+
+    def call(prompt, system, **kwargs):
+        systems.append(system)
+        prompts.append(prompt)
+        return "<p>ok</p>"
+
+    audit_sections.generate("Business context", call, company="Acme", date="today")
+    assert all(system == systems[0] for system in systems)
+    assert systems[0][-1] == {"type": "text", "text": "Business context", "cache_control": {"type": "ephemeral"}}
+    assert not any("Business context" in prompt for prompt in prompts)
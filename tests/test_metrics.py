@@ -0,0 +1,45 @@
+import metrics
+
+
+def test_streamed_body_carries_the_request_timer():
+    timer = metrics.start_request("stream_route")
+    finished = []
+    timer.finish = lambda status: finished.append(status)
+
+    def body():
+        with metrics.span("claude"):
+            metrics.record_usage({"input": 10, "output": 5})
+            yield b"chunk"
+        yield b"done"
+
+    stream = metrics.stream_request(body(), 200)
+    assert metrics._current.get() is None  # detached from the view's context
+    assert list(stream) == [b"chunk", b"done"]
+    assert finished == [200]
+    assert "claude" in timer.stages
+    assert timer.tokens["input"] == 10
+
+
+def test_closed_stream_finishes_the_timer():
+    timer = metrics.start_request("stream_route")
+    finished = []
+    timer.finish = lambda status: finished.append(status)
+
+    stream = metrics.stream_request(iter([b"a", b"b"]), 200)
+    next(stream)
+    stream.close()
+    assert finished == [200]
+
+
+def test_background_work_stays_out_of_request_latency():
+    def count(histogram, label):
+        return sum(
+            sample.value
+            for metric in histogram.collect()
+            for sample in metric.samples
+            if sample.name.endswith("_count") and label in sample.labels.values()
+        )
+
+    metrics.start_background("portfolio_site").finish(200)
+    assert count(metrics.BACKGROUND_SECONDS, "portfolio_site") == 1
+    assert count(metrics.REQUEST_SECONDS, "portfolio_site") == 0
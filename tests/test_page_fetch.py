@@ -0,0 +1,56 @@
+import page_fetch
+
+
+def test_cookie_state_class_on_body_keeps_page():
+    html = (
+        "<html><head><title>Acme Scaffolding Ltd</title></head>"
+        '<body class="home cookies-not-set"><p>We erect scaffolding.</p></body></html>'
+    )
+    assert page_fetch.extract_text(html) == "Acme Scaffolding Ltd We erect scaffolding."
+
+
+def test_consent_class_on_html_keeps_page():
+    html = '<html class="js consent-pending"><body><p>Text here</p></body></html>'
+    assert page_fetch.extract_text(html) == "Text here"
+
+
+def test_banner_elements_are_skipped_by_whole_token():
+    html = (
+        '<body><div id="cookie-banner">We use cookies</div>'
+        '<div class="wrap onetrust-consent-sdk">Accept all</div>'
+        '<div id="CybotCookiebotDialog">Allow selection</div>'
+        '<p>Real content</p><div class="recipe-cookies-list">Choc chip</div></body>'
+    )
+    assert page_fetch.extract_text(html) == "Real content Choc chip"
+
+
+def read(body: bytes, content_type: str = "text/html") -> str:
+    reader = page_fetch.PageReader(content_type, 4000)
+    for start in range(0, len(body), 1000):
+        if reader.feed(body[start : start + 1000]):
+            break
+    return reader.result("https://example.com", 200, exhausted=True)["text"]
+
+
+def test_meta_charset_used_when_header_has_none():
+    body = '<html><head><meta charset="iso-8859-1"></head><body><p>Café société</p></body></html>'
+    assert read(body.encode("latin-1")) == "Café société"
+
+
+def test_http_equiv_charset_used_when_header_has_none():
+    body = (
+        '<html><head><meta http-equiv="Content-Type" content="text/html; charset=windows-1252"></head>'
+        "<body><p>“Quoted” £500 cover</p></body></html>"
+    )
+    assert read(body.encode("cp1252")) == "“Quoted” £500 cover"
+
+
+def test_undeclared_encoding_is_detected():
+    text = "Über uns: Gebäudereinigung für Büros und Geschäfte. " * 20
+    assert read(f"<html><body><p>{text}</p></body></html>".encode("cp1252")) == text.strip()
+    assert read(f"<html><body><p>{text}</p></body></html>".encode("utf-8")) == text.strip()
+
+
+def test_header_charset_wins():
+    body = '<html><head><meta charset="utf-8"></head><body><p>Café</p></body></html>'
+    assert read(body.encode("latin-1"), "text/html; charset=ISO-8859-1") == "Café"
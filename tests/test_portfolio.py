@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+import portfolio
+
+
+@pytest.mark.parametrize("body", [{"rate": -1}, {"rate": 0}, {"rate": "nan"}, {"concurrency": 0}, {"concurrency": -4}])
+def test_limits_reject_values_that_remove_pacing(body):
+    with pytest.raises(ValueError):
+        portfolio.request_limits(body)
+
+
+def test_limits_clamp_to_server_budget(monkeypatch):
+    monkeypatch.setattr(portfolio, "CONCURRENCY", 4)
+    monkeypatch.setattr(portfolio, "RATE", 30.0)
+    assert portfolio.request_limits({}) == (4, 30.0)
+    assert portfolio.request_limits({"concurrency": 50, "rate": 600}) == (4, 30.0)
+    assert portfolio.request_limits({"concurrency": 2, "rate": 6}) == (2, 6.0)
+
+
+def test_unpaced_server_keeps_default(monkeypatch):
+    monkeypatch.setattr(portfolio, "RATE", 0.0)
+    assert portfolio.request_limits({})[1] == 0.0
+    assert portfolio.request_limits({"rate": 10})[1] == 10.0
+
+
+def test_expired_checkpoints_are_swept(monkeypatch, tmp_path):
+    monkeypatch.setattr(portfolio, "RUN_DIR", tmp_path)
+    old, fresh = tmp_path / "old.ndjson", tmp_path / "fresh.ndjson"
+    old.write_text("{}\n")
+    fresh.write_text("{}\n")
+    os.utime(old, (0, 0))
+
+    run_id, path = portfolio.checkpoint_path(None)
+    assert not old.exists()
+    assert fresh.exists()
+    assert path.parent == tmp_path
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+import report
+
+VALID = {
+    "company": "Acme Scaffolding Ltd",
+    "overview": ["Scaffolders need liability cover."],
+    "coverage": [
+        {
+            "coverage": "Public Liability",
+            "level": "critical",
+            "category": "Essential",
+            "scenario": "A pole falls on a car.",
+            "claim": "Notify the insurer within 7 days.",
+            "cost": "£900 - £1,500",
+        }
+    ],
+    "red_flags": [{"title": "No EL cover", "detail": "Legally required.", "example": None}],
+    "certificates": [{"name": "CISRS", "detail": "Operative cards."}],
+    "benefits": [{"heading": "Financial advantages", "points": ["Lower premiums"]}],
+}
+
+
+def test_valid_report_renders():
+    html = report.render(report.parse_report(json.dumps(VALID)), "1 January 2026")
+    assert "Public Liability" in html
+    assert report.is_report(json.dumps(VALID))
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"coverage": {"a": 1}},
+        {"red_flags": None},
+        {"overview": [{"text": "x"}]},
+        {"certificates": ["CISRS"]},
+        {"coverage": [{**VALID["coverage"][0], "cost": None}]},
+        {"benefits": [{"heading": "Financial", "points": "Lower premiums"}]},
+        {"red_flags": [{"title": "Gap", "detail": "Why", "example": ["nested"]}]},
+    ],
+)
+def test_wrongly_typed_sections_are_format_errors(changes):
+    text = json.dumps({**VALID, **changes})
+    with pytest.raises(report.ReportFormatError):
+        report.parse_report(text)
+    assert not report.is_report(text)
@@ -0,0 +1,183 @@
+import time
+
+import anyio
+import pytest
+
+import resilience
+
+
+class FakeResponse:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.headers = {}
+
+    def close(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """A fresh breaker that opens on one failure and goes half-open immediately."""
+    fresh = resilience.CircuitBreaker(threshold=1, cooldown=0.05)
+    monkeypatch.setattr(resilience, "breaker", fresh)
+    monkeypatch.setattr(resilience, "MAX_RETRIES", 0)
+    monkeypatch.setattr(resilience, "RPM", 0)
+    monkeypatch.setattr(resilience, "TPM", 0)
+    return fresh
+
+
+def trip(breaker):
+    resilience.send(lambda: FakeResponse(529))
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+
+
+def test_opens_after_threshold_and_rejects(breaker):
+    resp = resilience.send(lambda: FakeResponse(529))
+    assert resp.status_code == 529
+    assert breaker.state == "open"
+    with pytest.raises(resilience.ClaudeUnavailable):
+        resilience.send(lambda: FakeResponse(200))
+
+
+def test_half_open_allows_one_trial_then_closes(breaker):
+    trip(breaker)
+    assert breaker.before_call() is True
+    with pytest.raises(resilience.ClaudeUnavailable):
+        breaker.before_call()  # second caller while the trial is out
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.before_call() is False
+
+
+def test_failed_trial_reopens(breaker):
+    trip(breaker)
+    resilience.send(lambda: FakeResponse(529))
+    assert breaker.state == "open"
+
+
+def test_throttle_rejection_does_not_take_trial_slot(breaker, monkeypatch):
+    trip(breaker)
+    budget = {"exhausted": True}
+
+    def throttle(_tokens):
+        if budget["exhausted"]:
+            raise resilience.ClaudeUnavailable("budget exhausted")
+
+    monkeypatch.setattr(resilience, "throttle", throttle)
+    with pytest.raises(resilience.ClaudeUnavailable, match="budget"):
+        resilience.send(lambda: FakeResponse(200))
+
+    budget["exhausted"] = False
+    assert resilience.send(lambda: FakeResponse(200)).status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_trial_interrupted_by_unexpected_error_is_released(breaker):
+    trip(breaker)
+
+    def boom():
+        raise KeyError("not a transport error")
+
+    with pytest.raises(KeyError):
+        resilience.send(boom)
+    assert breaker.state == "half_open"
+    assert resilience.send(lambda: FakeResponse(200)).status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_cancelled_async_trial_is_released(breaker):
+    trip(breaker)
+
+    async def slow():
+        await anyio.sleep(10)
+        return FakeResponse(200)
+
+    async def fast():
+        return FakeResponse(200)
+
+    async def main():
+        with anyio.move_on_after(0.05):
+            await resilience.send_async(slow)
+        return await resilience.send_async(fast)
+
+    assert anyio.run(main).status_code == 200
+    assert breaker.state == "closed"
+
+
+@pytest.fixture
+def hedging(monkeypatch):
+    """Hedging on, with a learned p95 of 0.3 s for ``kind`` and room for one hedge."""
+    monkeypatch.setattr(resilience, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(resilience, "_latencies", {"kind": resilience.deque([0.3] * 20, maxlen=200)})
+    monkeypatch.setattr(resilience, "_hedge_slots", resilience.threading.BoundedSemaphore(1))
+
+
+def test_primaries_do_not_queue_behind_each_other(hedging):
+    calls = []
+
+    def call():
+        calls.append(1)
+        time.sleep(0.1)
+        return "ok"
+
+    started = time.monotonic()
+    with resilience.ThreadPoolExecutor(max_workers=24) as callers:
+        results = list(callers.map(lambda _: resilience.hedged("kind", call), range(24)))
+    assert results == ["ok"] * 24
+    assert time.monotonic() - started < 0.3
+    assert len(calls) == 24  # no hedges fired
+
+
+def test_hedge_wins_over_slow_primary(hedging):
+    delays = iter([2.0, 0.0])
+
+    def call():
+        time.sleep(next(delays))
+        return "ok"
+
+    started = time.monotonic()
+    assert resilience.hedged("kind", call) == "ok"
+    assert time.monotonic() - started < 1.0
+
+
+def test_hedges_beyond_the_cap_are_skipped(hedging):
+    calls = []
+
+    def call():
+        calls.append(1)
+        time.sleep(0.5)
+        return "ok"
+
+    with resilience.ThreadPoolExecutor(max_workers=2) as callers:
+        results = list(callers.map(lambda _: resilience.hedged("kind", call), range(2)))
+    assert results == ["ok", "ok"]
+    assert len(calls) == 3  # two primaries, one hedge
+
+
+def test_hedge_win_records_the_primarys_own_latency(hedging):
+    delays = iter([0.6, 0.0])
+
+    def call():
+        time.sleep(next(delays))
+        return "ok"
+
+    assert resilience.hedged("kind", call) == "ok"
+    assert len(resilience._latencies["kind"]) == 20  # the hedge's quick answer is not a sample
+    time.sleep(0.4)
+    assert resilience._latencies["kind"][-1] >= 0.6
+
+
+def test_retries_are_throttled(breaker, monkeypatch):
+    monkeypatch.setattr(resilience, "MAX_RETRIES", 2)
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt, retry_after=None: 0)
+    throttled = []
+    monkeypatch.setattr(resilience, "throttle", lambda tokens: throttled.append(tokens))
+    statuses = iter([529, 529, 200])
+
+    assert resilience.send(lambda: FakeResponse(next(statuses)), estimated_tokens=50).status_code == 200
+    assert throttled == [50, 50, 50]
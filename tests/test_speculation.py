@@ -0,0 +1,29 @@
+import time
+
+import pytest
+
+import speculation
+
+
+@pytest.fixture
+def speculate(monkeypatch):
+    monkeypatch.setattr(speculation, "ENABLED", True)
+    monkeypatch.setattr(speculation, "WORKERS", 1)
+    monkeypatch.setattr(speculation, "TIMEOUT", 0.2)
+
+
+def test_overrun_run_gives_up_its_slot(speculate):
+    def slow(website, files, mode, use_cache):
+        time.sleep(0.6)
+        return "<html>late</html>"
+
+    def fast(website, files, mode, use_cache):
+        return "<html>ok</html>"
+
+    assert speculation.start("https://slow.example", "html", slow)
+    assert not speculation.start("https://next.example", "html", fast)  # slot taken
+    time.sleep(0.3)
+    assert speculation.start("https://next.example", "html", fast)
+    assert speculation.attach("https://next.example", [], "html") == "<html>ok</html>"
+    time.sleep(0.4)
+    assert speculation.attach("https://slow.example", [], "html") is None  # overrun result is discarded
@@ -0,0 +1,32 @@
+import io
+import os
+import uuid
+
+import uploads
+
+
+def test_dedupe_rewrites_a_blob_swept_mid_store(monkeypatch):
+    data = uuid.uuid4().bytes * 100
+    first = uploads.store(uuid.uuid4().hex[:12], "a.pdf", io.BytesIO(data))
+    real_utime = os.utime
+
+    def swept_then_utime(path, *args):
+        os.remove(path)  # the sweep in another worker got there first
+        return real_utime(path, *args)
+
+    monkeypatch.setattr(uploads.os, "utime", swept_then_utime)
+    second = uploads.store(uuid.uuid4().hex[:12], "b.pdf", io.BytesIO(data))
+    assert second["sha256"] == first["sha256"]
+    assert not second["deduplicated"]
+    with open(second["path"], "rb") as fh:
+        assert fh.read() == data
+
+
+def test_sweep_keeps_blob_still_referenced():
+    data = uuid.uuid4().bytes * 100
+    old = uploads.store(uuid.uuid4().hex[:12], "a.pdf", io.BytesIO(data))
+    uploads._db().execute("UPDATE uploads SET created_at = 0 WHERE id = ?", (old["id"],))
+    new = uploads.store(uuid.uuid4().hex[:12], "b.pdf", io.BytesIO(data))
+    uploads.sweep()
+    assert uploads.lookup([old["id"], new["id"]]) == [uploads.lookup([new["id"]])[0]]
+    assert os.path.exists(new["path"])
@@ -0,0 +1,316 @@
+# uploads.py - Content-addressed upload storage, manifest and garbage collection
+"""
+Uploads are streamed to disk in fixed-size chunks while their SHA-256 is
+computed, then stored once under ``blobs/<sha[:2]>/<sha>``. Re-uploading the
+same bytes only adds a new id pointing at the existing blob.
+
+Every upload id is recorded in a SQLite manifest (id → path, size, hash,
+created-at), so lookups are a primary-key read instead of a glob over the
+whole upload directory.
+
+A daemon sweeper thread in each worker deletes uploads older than
+``UPLOAD_TTL`` and, oldest first, anything over ``UPLOAD_QUOTA_MB``. Workers
+claim the sweep through the manifest so only one of them runs it per interval.
+"""
+
+import hashlib
+import os
+import pathlib
+import re
+import tempfile
+import threading
+import time
+
+import metrics
+import storage
+
+# ────────── configuration ────────────────────────────────────────────────────
+
+UPLOAD_DIR = pathlib.Path(tempfile.gettempdir()) / "joro_uploads"
+BLOB_DIR = UPLOAD_DIR / "blobs"
+INCOMING_DIR = UPLOAD_DIR / "incoming"
+BLOB_DIR.mkdir(parents=True, exist_ok=True)
+INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+
+MAX_BYTES = int(float(os.getenv("UPLOAD_MAX_MB", "25")) * 1024 * 1024)
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+
+TTL = int(os.getenv("UPLOAD_TTL", str(24 * 3600)))
+QUOTA_BYTES = int(float(os.getenv("UPLOAD_QUOTA_MB", "1024")) * 1024 * 1024)
+SWEEP_INTERVAL = int(os.getenv("UPLOAD_SWEEP_INTERVAL", "300"))
+
+_DB = "uploads.db"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id         TEXT PRIMARY KEY,
+    filename   TEXT NOT NULL,
+    path       TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    sha256     TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_created_at ON uploads (created_at);
+CREATE INDEX IF NOT EXISTS uploads_sha256 ON uploads (sha256);
+CREATE TABLE IF NOT EXISTS sweeps (
+    name     TEXT PRIMARY KEY,
+    last_run REAL NOT NULL
+);
+INSERT OR IGNORE INTO sweeps (name, last_run) VALUES ('uploads', 0);
+"""
+
+
+_SHA256_RE = re.compile(r"[0-9a-f]{64}")
+
+
+class UploadTooLarge(Exception):
+    """The upload exceeded ``MAX_BYTES``."""
+
+
+def _db():
+    return storage.connect(_DB, _SCHEMA)
+
+
+def blob_path(sha256: str) -> pathlib.Path:
+    return BLOB_DIR / sha256[:2] / sha256
+
+
+# ────────── storage ──────────────────────────────────────────────────────────
+
+def _register(fid: str, filename: str, path: pathlib.Path, size: int, sha256: str) -> dict:
+    start_sweeper()
+    entry = {
+        "id": fid,
+        "filename": filename,
+        "path": str(path),
+        "size": size,
+        "sha256": sha256,
+        "created_at": time.time(),
+    }
+    _db().execute(
+        "INSERT OR REPLACE INTO uploads (id, filename, path, size, sha256, created_at) "
+        "VALUES (:id, :filename, :path, :size, :sha256, :created_at)",
+        entry,
+    )
+    return entry
+
+
+def store(fid: str, filename: str, stream) -> dict:
+    """Stream ``stream`` to disk in chunks, hashing as we go, and dedupe by hash.
+
+    Raises ``UploadTooLarge`` as soon as more than ``MAX_BYTES`` have been
+    read; the partial file is discarded.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp = INCOMING_DIR / f"{fid}.part"
+    try:
+        with open(tmp, "wb") as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_BYTES:
+                    raise UploadTooLarge(f"file exceeds {MAX_BYTES / (1024 * 1024):g} MB limit")
+                digest.update(chunk)
+                out.write(chunk)
+
+        sha256 = digest.hexdigest()
+        target = blob_path(sha256)
+        # Row first: a sweep that removes the blob either runs before the
+        # insert (utime below fails and we write it again) or sees the row.
+        entry = _register(fid, filename, target, size, sha256)
+        try:
+            os.utime(target)
+            deduplicated = True
+            tmp.unlink()
+        except FileNotFoundError:
+            deduplicated = False
+            target.parent.mkdir(exist_ok=True)
+            os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        _db().execute("DELETE FROM uploads WHERE id = ?", (fid,))
+        raise
+
+    metrics.incr("uploads_deduplicated" if deduplicated else "uploads_stored")
+    if deduplicated:
+        metrics.incr("uploads_deduplicated_bytes", size)
+    return {**entry, "deduplicated": deduplicated}
+
+
+def link(fid: str, filename: str, sha256: str) -> dict | None:
+    """Register ``fid`` against an already-stored blob, or None if unknown."""
+    sha256 = sha256.lower()
+    if not _SHA256_RE.fullmatch(sha256):
+        return None
+    target = blob_path(sha256)
+    try:
+        size = target.stat().st_size
+        # Row before utime, as in ``store``, so a concurrent sweep keeps the blob.
+        entry = _register(fid, filename, target, size, sha256)
+        os.utime(target)
+    except FileNotFoundError:
+        _db().execute("DELETE FROM uploads WHERE id = ?", (fid,))
+        return None
+    metrics.incr("uploads_linked")
+    return {**entry, "deduplicated": True}
+
+
+# ────────── manifest ─────────────────────────────────────────────────────────
+
+def lookup(file_ids: list[str]) -> list[dict]:
+    """Manifest entries for the given ids, in order; unknown ids are skipped."""
+    start_sweeper()
+    conn = _db()
+    files = []
+    for fid in file_ids:
+        row = conn.execute(
+            "SELECT id, filename, path, size, sha256, created_at FROM uploads WHERE id = ?",
+            (fid,),
+        ).fetchone()
+        if row is not None:
+            files.append(dict(row))
+    return files
+
+
+# ────────── garbage collection ───────────────────────────────────────────────
+
+def _delete(conn, rows) -> int:
+    """Drop manifest rows; a blob is removed once no id references it."""
+    freed = 0
+    for row in rows:
+        # One write transaction per row, so ``store`` cannot register a new id
+        # for this blob between the reference check and the removal.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM uploads WHERE id = ?", (row["id"],))
+            shared = conn.execute(
+                "SELECT 1 FROM uploads WHERE path = ? LIMIT 1", (row["path"],)
+            ).fetchone()
+            if not shared:
+                try:
+                    os.remove(row["path"])
+                    freed += row["size"]
+                except FileNotFoundError:
+                    pass
+        finally:
+            conn.execute("COMMIT")
+    return freed
+
+
+def _stored_bytes(conn) -> int:
+    """Bytes on disk referenced by the manifest, counting shared blobs once."""
+    return conn.execute(
+        "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM uploads GROUP BY path)"
+    ).fetchone()[0]
+
+
+def _walk_files(root: pathlib.Path):
+    for dirpath, _dirs, names in os.walk(root):
+        for name in names:
+            yield os.path.join(dirpath, name)
+
+
+def sweep(now: float | None = None) -> dict:
+    """Evict expired uploads, then the oldest ones until under quota."""
+    now = time.time() if now is None else now
+    conn = _db()
+
+    expired = conn.execute(
+        "SELECT id, path, size FROM uploads WHERE created_at < ?", (now - TTL,)
+    ).fetchall()
+    freed = _delete(conn, expired)
+    evicted = len(expired)
+
+    total = _stored_bytes(conn)
+    while total > QUOTA_BYTES:
+        rows = conn.execute(
+            "SELECT id, path, size FROM uploads ORDER BY created_at LIMIT 50"
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            if total <= QUOTA_BYTES:
+                break
+            released = _delete(conn, [row])
+            total -= released
+            freed += released
+            evicted += 1
+
+    # Unreferenced files (pre-manifest uploads, abandoned partials) age out by mtime.
+    known = {row["path"] for row in conn.execute("SELECT DISTINCT path FROM uploads")}
+    for path in _walk_files(UPLOAD_DIR):
+        try:
+            st = os.stat(path)
+            if path not in known and st.st_mtime < now - TTL:
+                os.remove(path)
+                freed += st.st_size
+                evicted += 1
+        except FileNotFoundError:
+            pass
+
+    if evicted:
+        metrics.incr("uploads_evicted", evicted)
+        metrics.incr("uploads_evicted_bytes", freed)
+        print(f"[Uploads] swept {evicted} files | freed {freed / 1024:.0f} KiB")
+    return {"evicted": evicted, "freed_bytes": freed}
+
+
+def _claim_sweep(now: float) -> bool:
+    """Atomically take this interval's sweep so workers don't all run it."""
+    cur = _db().execute(
+        "UPDATE sweeps SET last_run = ? WHERE name = 'uploads' AND last_run < ?",
+        (now, now - SWEEP_INTERVAL),
+    )
+    return cur.rowcount == 1
+
+
+def _sweeper_loop() -> None:
+    while True:
+        try:
+            if _claim_sweep(time.time()):
+                sweep()
+        except Exception as exc:  # keep the sweeper alive on transient errors
+            print(f"[Uploads] sweep failed: {exc}")
+        time.sleep(SWEEP_INTERVAL)
+
+
+_sweeper_pid: int | None = None
+_sweeper_lock = threading.Lock()
+
+
+def start_sweeper() -> None:
+    """Start this process's sweeper thread once (re-started after a fork)."""
+    global _sweeper_pid
+    if _sweeper_pid == os.getpid() or SWEEP_INTERVAL <= 0:
+        return
+    with _sweeper_lock:
+        if _sweeper_pid != os.getpid():
+            threading.Thread(target=_sweeper_loop, name="upload-sweeper", daemon=True).start()
+            _sweeper_pid = os.getpid()
+
+
+def stats() -> dict:
+    """Upload directory size / file count alongside the manifest totals."""
+    files = size = 0
+    for path in _walk_files(UPLOAD_DIR):
+        try:
+            size += os.stat(path).st_size
+            files += 1
+        except FileNotFoundError:
+            pass
+    conn = _db()
+    count, logical, blobs = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0), COUNT(DISTINCT path) FROM uploads"
+    ).fetchone()
+    return {
+        "dir_files": files,
+        "dir_bytes": size,
+        "manifest_entries": count,
+        "manifest_blobs": blobs,
+        "manifest_bytes": _stored_bytes(conn),
+        "logical_bytes": logical,
+        "ttl_seconds": TTL,
+        "quota_bytes": QUOTA_BYTES,
+    }